@@ -1,15 +1,9 @@
-import geopandas as gpd
-from shapely.geometry import Point
-import pandas as pd
-import numpy as np
-from collections import defaultdict, deque
 from datetime import datetime
 from .input_loader import InputLoader
 from .input_checker import InputChecker
 from .resolvable_lake_identifier import ResolvableLakes
 from .network_correction import NetworkTopologyCorrection
 from .output_checker import OutputChecker
-from .utility import Utility
 
 
 class BurnLakes:
@@ -29,17 +23,13 @@ class BurnLakes:
         print("=======================================================================")
         print("=== Input loader started at :", t0.strftime("%Y-%m-%d %H:%M:%S"), " ===")
         loader = InputLoader(config)
-        # Keep originals (read-only by convention)
-        self.cat_org  = loader.cat
-        self.riv_org  = loader.riv
-        self.lake_org = loader.lake
+        # No working copies here: InputChecker copies its inputs itself
+        self.cat  = loader.cat
+        self.riv  = loader.riv
+        self.lake = loader.lake
         self.cat_dict = loader.cat_dict
         self.riv_dict = loader.riv_dict
         self.lake_dict = loader.lake_dict
-        # Working copies (single deep copy)
-        self.cat  = self.cat_org.copy()
-        self.riv  = self.riv_org.copy()
-        self.lake = self.lake_org.copy()
         del loader
         t1 = datetime.now()
         print("=== Input loader finished at:", t1.strftime("%Y-%m-%d %H:%M:%S"), " ===")
@@ -57,6 +47,8 @@ class BurnLakes:
                                cat=self.cat, cat_dict=self.cat_dict,
                                lake=self.lake, lake_dict=self.lake_dict)
         self.cat, self.riv, self.lake = checker.cat, checker.riv, checker.lake
+        # Keep checked originals (read-only by convention); every later stage
+        # copies before modifying, so sharing the frames is safe
         self.cat_org, self.riv_org, self.lake_org = checker.cat, checker.riv, checker.lake
         del checker
         t1 = datetime.now()
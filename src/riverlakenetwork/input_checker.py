@@ -1,6 +1,12 @@
 import geopandas as gpd
+import numpy as np
 from .utility import Utility
 
+# Area unit factors to m2 and the derived pairwise conversion table
+_AREA_UNIT_TO_M2 = {"m2": 1.0, "ha": 1e4, "km2": 1e6}
+_AREA_CONV = {(a, b): _AREA_UNIT_TO_M2[a] / _AREA_UNIT_TO_M2[b]
+              for a in _AREA_UNIT_TO_M2 for b in _AREA_UNIT_TO_M2}
+
 class InputChecker:
     """
     Checks river network, subbasins, and lakes.
@@ -39,13 +45,8 @@ class InputChecker:
             self.cat_dict = cat_dict or {}
             self.lake = lake
             self.lake_dict = lake_dict or {}
-        # Make copies to avoid modifying original data
-        if self.riv is not None:
-            self.riv = self.riv.copy()
-        if self.cat is not None:
-            self.cat = self.cat.copy()
-        if self.lake is not None:
-            self.lake = self.lake.copy()
+        # No up-front copies: the attribute checks below rebuild each layer
+        # from a column selection before anything is modified
         # Run the fucntion
         self._check_riv_attr()
         self._check_cat_attr()
@@ -80,9 +81,11 @@ class InputChecker:
             rename_map[col_name] = key
         if geom_required and "geometry" not in gdf.columns:
             raise ValueError(f"{gdf_name} must have a 'geometry' column")
-        # Keep only columns in rename_map + geometry
+        # Keep only columns in rename_map + geometry; the selection is already
+        # a new frame, so rename its columns in place instead of copying again
         keep_cols = list(rename_map.keys()) + (["geometry"] if geom_required else [])
-        gdf = gdf[keep_cols].rename(columns=rename_map)
+        gdf = gdf[keep_cols]
+        gdf.columns = [rename_map.get(c, c) for c in keep_cols]
         setattr(self, gdf_name, gdf)
     # Then your specific checks become one-liners:
     def _check_riv_attr(self):
@@ -98,24 +101,31 @@ class InputChecker:
         """
         if self.riv is None or self.cat is None:
             raise ValueError("Both riv and cat GeoDataFrames must be loaded to check COMIDs.")
-        # Extract COMID series
-        riv_COMIDs = self.riv['COMID']
-        cat_COMIDs = self.cat['COMID']
+        # Extract COMID arrays and their sort order (reused for the final sort)
+        riv_COMIDs = self.riv['COMID'].to_numpy()
+        cat_COMIDs = self.cat['COMID'].to_numpy()
         # Check lengths
         if len(riv_COMIDs) != len(cat_COMIDs):
             raise ValueError(f"Length mismatch: riv has {len(riv_COMIDs)}, cat has {len(cat_COMIDs)}")
-        # Check exact matching
-        if not set(riv_COMIDs) == set(cat_COMIDs):
-            missing_in_riv = set(cat_COMIDs) - set(riv_COMIDs)
-            missing_in_cat = set(riv_COMIDs) - set(cat_COMIDs)
-            raise ValueError(
-                f"COMID mismatch between riv and cat.\n"
-                f"Missing in riv: {missing_in_riv}\n"
-                f"Missing in cat: {missing_in_cat}"
-            )
+        riv_order = np.argsort(riv_COMIDs, kind="stable")
+        cat_order = np.argsort(cat_COMIDs, kind="stable")
+        riv_sorted = riv_COMIDs[riv_order]
+        cat_sorted = cat_COMIDs[cat_order]
+        # Check exact matching (as sets; sorted arrays first, uniques only if needed)
+        if not np.array_equal(riv_sorted, cat_sorted):
+            riv_unique = np.unique(riv_sorted)
+            cat_unique = np.unique(cat_sorted)
+            if not np.array_equal(riv_unique, cat_unique):
+                missing_in_riv = set(np.setdiff1d(cat_unique, riv_unique, assume_unique=True).tolist())
+                missing_in_cat = set(np.setdiff1d(riv_unique, cat_unique, assume_unique=True).tolist())
+                raise ValueError(
+                    f"COMID mismatch between riv and cat.\n"
+                    f"Missing in riv: {missing_in_riv}\n"
+                    f"Missing in cat: {missing_in_cat}"
+                )
         # Sort both GeoDataFrames by COMID
-        self.riv = self.riv.sort_values('COMID').reset_index(drop=True)
-        self.cat = self.cat.sort_values('COMID').reset_index(drop=True)
+        self.riv = self.riv.iloc[riv_order].reset_index(drop=True)
+        self.cat = self.cat.iloc[cat_order].reset_index(drop=True)
 
 
     def _check_area_units(self):
@@ -139,13 +149,13 @@ class InputChecker:
         lake_entry = self.lake_dict.get("unitarea")
         if lake_entry is None or "col" not in lake_entry or "unit" not in lake_entry:
             raise ValueError("lake_dict must have 'unitarea' with 'col' and 'unit'")
-        lake_area_col = lake_entry["col"]
         lake_unit = lake_entry["unit"]
         # Check if units differ
         if cat_unit != lake_unit:
             # Convert lake area to cat unit
             conversion = self._get_area_conversion(lake_unit, cat_unit)
-            self.lake[lake_area_col] = self.lake[lake_area_col] * conversion
+            # _check_lake_attr has already renamed the area column to 'unitarea'
+            self.lake["unitarea"] *= conversion
             print(f"Converted lake area from {lake_unit} to {cat_unit}")
             # Update lake_dict unit to match cat
             self.lake_dict["unitarea"]["unit"] = cat_unit
@@ -157,14 +167,14 @@ class InputChecker:
         Return a multiplier to convert area from 'from_unit' to 'to_unit'.
         Supported units: 'm2', 'ha', 'km2'
         """
-        # Convert everything to m2 first
-        unit_to_m2 = {"m2": 1, "ha": 10000, "km2": 1e6}
-        if from_unit not in unit_to_m2 or to_unit not in unit_to_m2:
-            raise ValueError(f"Unsupported area unit conversion: {from_unit} -> {to_unit}")
-        return unit_to_m2[from_unit] / unit_to_m2[to_unit]
+        # Table lookup; factors are precomputed at import time
+        try:
+            return _AREA_CONV[(from_unit, to_unit)]
+        except KeyError:
+            raise ValueError(f"Unsupported area unit conversion: {from_unit} -> {to_unit}") from None
 
 
-    def _check_crs(self, suppress=False):
+    def _check_crs(self, suppress=False, verbose=True):
         """
         Check that CRS is set for riv, cat, and lake (if provided)
         and that they are identical.
@@ -172,6 +182,8 @@ class InputChecker:
         ----------
         suppress : bool, optional
             If True, do not raise an error when CRS mismatch occurs; just print a warning.
+        verbose : bool, optional
+            If True, print the CRS of each layer.
         """
         crs_list = []
         if self.riv is not None:
@@ -187,11 +199,12 @@ class InputChecker:
                 raise ValueError("Lakes GeoDataFrame has no CRS defined.")
             crs_list.append(("lake", self.lake.crs))
         # Print CRS of each layer
-        for name, crs in crs_list:
-            print(f"{name} CRS: {crs}")
-        # Check if all CRS are identical
-        crs_values = [crs for _, crs in crs_list]
-        if len(set(crs_values)) > 1:
+        if verbose:
+            for name, crs in crs_list:
+                print(f"{name} CRS: {crs}")
+        # Check if all CRS are identical (EPSG code when known, WKT otherwise)
+        crs_keys = {crs.to_epsg() or crs.to_wkt() for _, crs in crs_list}
+        if len(crs_keys) > 1:
             msg = f"CRS mismatch among provided GeoDataFrames: {crs_list}"
             if suppress:
                 print("WARNING:", msg)
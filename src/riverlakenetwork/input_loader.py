@@ -8,7 +8,7 @@ class InputLoader:
     Supports both file paths (str/Path) and pre-loaded GeoDataFrames.
     """
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, cache: bool = True):
         """
         Initialize the config class.
 
@@ -19,8 +19,13 @@ class InputLoader:
                 - riv, riv_dict
                 - cat, cat_dict
                 - lake, lake_dict
+        cache : bool, optional
+            If True, layers given as file paths are also written to a
+            ``<file>.cache.parquet`` sidecar on first read, and later runs
+            read the sidecar while it is newer than the source file.
         """
         self.config = config
+        self.cache = cache
 
         # Initialize attributes
         self.riv = None
@@ -101,18 +106,43 @@ class InputLoader:
     # -------------------------------
     # Loading GeoDataFrames
     # -------------------------------
+    # shapefile components whose edits must invalidate the parquet sidecar
+    _SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
     def _load_layer(self, layer):
         """Helper to load either a file path or a GeoDataFrame"""
         if isinstance(layer, (str, Path)):
             path = Path(layer)
             if not path.exists():
                 raise FileNotFoundError(f"File not found: {path}")
-            return gpd.read_file(path)
+            if not self.cache:
+                return gpd.read_file(path)
+            return self._load_cached(path)
         elif isinstance(layer, gpd.GeoDataFrame):
             return layer.copy()
         else:
             raise TypeError("Layer must be a file path (str/Path) or a GeoDataFrame")
 
+    def _load_cached(self, path):
+        """Read `path` through its parquet sidecar, (re)writing it when stale."""
+        cache = path.with_name(path.name + ".cache.parquet")
+        sources = [path]
+        if path.suffix.lower() == ".shp":
+            sources += [path.with_suffix(ext) for ext in self._SHAPEFILE_PARTS]
+        source_mtime = max(p.stat().st_mtime for p in sources if p.exists())
+        if cache.exists() and cache.stat().st_mtime >= source_mtime:
+            try:
+                return gpd.read_parquet(cache)
+            except Exception:
+                pass  # unreadable sidecar: fall back to the source
+        gdf = gpd.read_file(path)
+        try:
+            gdf.to_parquet(cache)
+        except (ImportError, OSError, ValueError):
+            # no pyarrow, read-only location or unsupported columns: skip caching
+            pass
+        return gdf
+
     def _load_riv(self):
         if "riv" in self.config and self.config["riv"] is not None:
             self.riv = self._load_layer(self.config["riv"])
@@ -1,4 +1,5 @@
 import geopandas as gpd
+import shapely
 from   shapely.geometry import Point
 import pandas as pd
 import numpy as np
@@ -22,28 +23,27 @@ class NetworkTopologyCorrection:
         self.lake_corrected = lake
 
 
-    def _cat_geometry_correction(self, cat: gpd.GeoDataFrame, lake: gpd.GeoDataFrame):
+    def _cat_geometry_correction(self, cat: gpd.GeoDataFrame, lake: gpd.GeoDataFrame, index=None):
         """Correct CAT 'unitarea' after removing lake-covered areas; replace geometry with difference geometry when partially removed and keep area_ratio."""
-        cat_int = self._shp1_shp2_overlay_info(cat, lake, how='difference') # _river_lake_difference_info(cat, lake)  # compute CAT - LAKE difference
-        cat_out = cat.copy()  # copy original CAT
-        cat_out["area_org"] = cat_out.geometry.area  # original CAT area
-        cat_int["area_out_lake"] = cat_int.geometry.area  # area after removing lake
-        area_map = cat_int.set_index("COMID")["area_out_lake"]  # map area_out_lake by COMID (may miss fully removed)
-        cat_out["area_out_lake"] = cat_out["COMID"].map(area_map).fillna(0)  # missing -> fully removed -> 0
-        cat_out["area_ratio"] = cat_out["area_out_lake"] / cat_out["area_org"]  # compute area ratio (0..1)
-        # prepare difference geometry per COMID (dissolve to ensure a single geometry per COMID)
-        if not cat_int.empty:
-            diff_geom_map = cat_int.dissolve(by="COMID").reset_index().set_index("COMID")["geometry"]
-        else:
-            diff_geom_map = {}
+        geom = cat.geometry.values.copy()  # work on arrays, write back once
+        area_org = shapely.area(cat.geometry.to_numpy())  # original CAT area
+        # compute CAT - LAKE difference from one STRtree query over the lakes
+        geom_cat, geom_lake, idx_cat, idx_lake = self._shp1_shp2_pairs(cat, lake, index=index)
+        diff_geom = self._pairs_difference(geom_cat, geom_lake, idx_cat, idx_lake)
+        # area after removing lake; None (fully removed or missing) -> 0
+        area_out_lake = np.nan_to_num(shapely.area(diff_geom), nan=0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            area_ratio = area_out_lake / area_org  # compute area ratio (0..1)
         # assign geometries: if fully removed -> None; if partially removed -> diff geometry; if unchanged -> keep original
-        partially_removed_mask = (cat_out["area_ratio"] > 0) & (cat_out["area_ratio"] < 1)
-        cat_out.loc[partially_removed_mask, "geometry"] = cat_out.loc[partially_removed_mask, "COMID"].map(diff_geom_map)
-        cat_out.loc[cat_out["area_ratio"] == 0, "geometry"] = None
+        partially_removed_mask = (area_ratio > 0) & (area_ratio < 1)
+        geom[partially_removed_mask] = diff_geom[partially_removed_mask]
+        geom[area_ratio == 0] = None
         # correct unitarea proportionally and keep area_ratio for output
-        cat_out["unitarea"] = cat_out["unitarea"] * cat_out["area_ratio"]
-        cat_out = cat_out.drop(columns=["area_org", "area_out_lake"])  # keep area_ratio for return
-        return cat_out
+        return cat.assign(
+            geometry=geom,
+            unitarea=cat["unitarea"].to_numpy() * area_ratio,
+            area_ratio=area_ratio,
+        )
 
     # def _river_lake_intersection_info(
     #     self,
@@ -264,7 +264,108 @@ class NetworkTopologyCorrection:
 
 
 
-    def _riv_geometry_correction(self, riv: gpd.GeoDataFrame, lake: gpd.GeoDataFrame):
+    @staticmethod
+    def _make_valid_polygons(geom: np.ndarray):
+        """Return a copy of ``geom`` with invalid (multi)polygons repaired, as gpd.overlay does."""
+        invalid = (
+            np.isin(shapely.get_type_id(geom), [3, 6])  # Polygon, MultiPolygon
+            & ~shapely.is_valid(geom)
+        )
+        if not invalid.any():
+            return geom
+        geom = geom.copy()
+        geom[invalid] = shapely.make_valid(geom[invalid])
+        return geom
+
+    def _geometry_index(self, shp: gpd.GeoDataFrame):
+        """Repaired geometry array of `shp` and the STRtree built over it."""
+        geom = self._make_valid_polygons(shp.geometry.to_numpy())
+        return geom, shapely.STRtree(geom)
+
+    def _shp1_shp2_pairs(
+        self,
+        shp1: gpd.GeoDataFrame,
+        shp2: gpd.GeoDataFrame,
+        index=None,
+    ):
+        """
+        Find all intersecting (shp1, shp2) geometry pairs with a single STRtree
+        bulk query over `shp2`.
+
+        Null or empty geometries are never part of a pair, so callers do not
+        need to pre-filter either layer. `index` may pass in the
+        `_geometry_index(shp2)` result to reuse one tree across queries.
+
+        Returns
+        -------
+        geom1, geom2 : numpy.ndarray
+            Shapely geometries of `shp1` and `shp2` (positional order).
+        idx1, idx2 : numpy.ndarray
+            Positional indices of the intersecting pairs, sorted by `idx1`.
+        """
+        geom1 = self._make_valid_polygons(shp1.geometry.to_numpy())
+        geom2, tree = self._geometry_index(shp2) if index is None else index
+        idx1, idx2 = tree.query(geom1, predicate="intersects")
+        order = np.argsort(idx1, kind="stable")
+        return geom1, geom2, idx1[order], idx2[order]
+
+    @staticmethod
+    def _pairs_difference(
+        geom1: np.ndarray,
+        geom2: np.ndarray,
+        idx1: np.ndarray,
+        idx2: np.ndarray,
+    ):
+        """
+        Subtract from each `geom1` the union of the `geom2` it intersects.
+
+        Geometries without a pair are returned unchanged; geometries that are
+        fully removed are returned as None (same as rows dropped by
+        gpd.overlay(how="difference")).
+        """
+        out = geom1.copy()
+        if idx1.size == 0:
+            return out
+        left, start = np.unique(idx1, return_index=True)
+        cover = np.empty(left.size, dtype=object)
+        cover[:] = [shapely.union_all(geom2[right]) for right in np.split(idx2, start[1:])]
+        diff = shapely.difference(geom1[left], cover)
+        diff[shapely.is_empty(diff)] = None
+        out[left] = diff
+        return out
+
+    @staticmethod
+    def _align(keys_src, vals_src, keys_dst, fill=None):
+        """
+        Look up `vals_src` (keyed by `keys_src`) for every key in `keys_dst`.
+
+        Sorted-key binary search instead of a dict/Series.map lookup. Returns
+        the aligned values (``fill`` where a key is missing) and the mask of
+        keys that were found. On duplicate source keys the first one wins.
+        """
+        keys_src = np.asarray(keys_src)
+        vals_src = np.asarray(vals_src)
+        keys_dst = np.asarray(keys_dst)
+        order = np.argsort(keys_src, kind="stable")
+        ks = keys_src[order]
+        vs = vals_src[order]
+        pos = np.searchsorted(ks, keys_dst)
+        if ks.size:
+            valid = ks[np.clip(pos, 0, ks.size - 1)] == keys_dst
+        else:
+            valid = np.zeros(keys_dst.shape, dtype=bool)
+        dtype = object if fill is None else np.result_type(vs.dtype, np.asarray(fill).dtype)
+        out = np.full(keys_dst.shape, fill, dtype=dtype)
+        out[valid] = vs[pos[valid]]
+        return out, valid
+
+    def _riv_lake_pairs(self, riv: gpd.GeoDataFrame, lake: gpd.GeoDataFrame, index=None):
+        """River/lake candidate pairs plus the length of each pair's intersection."""
+        geom_riv, geom_lake, idx_riv, idx_lake = self._shp1_shp2_pairs(riv, lake, index=index)
+        inter_len = shapely.length(shapely.intersection(geom_riv[idx_riv], geom_lake[idx_lake]))
+        return geom_riv, geom_lake, idx_riv, idx_lake, inter_len
+
+    def _riv_geometry_correction(self, riv: gpd.GeoDataFrame, lake: gpd.GeoDataFrame, pairs=None):
         """
         Correct river lengths under lakes:
 
@@ -273,46 +374,47 @@ class NetworkTopologyCorrection:
         - update 'length' using ratio
         - replace geometry with difference if partially submerged
         - geometry = None if fully submerged
+
+        `pairs` may pass in (geom_riv, geom_lake, idx_riv, idx_lake, inter_len)
+        already computed for the same riv/lake layers.
         """
-        riv = riv.copy()
+        # Work on plain arrays; the frame is written once at the end
+        geom = riv.geometry.values.copy()
         # Original river length (km or projected units)
-        riv["length_org"] = riv.geometry.length
-        # --- river ∩ lake ---
-        riv_int = self._shp1_shp2_overlay_info(riv, lake, how="intersection")
+        length_org = shapely.length(riv.geometry.to_numpy())
+        # --- river ∩ lake candidate pairs (single STRtree query) ---
+        if pairs is None:
+            pairs = self._riv_lake_pairs(riv, lake)
+        geom_riv, geom_lake, idx_riv, idx_lake, inter_len = pairs
+        # Total submerged length per river, summed over all intersecting lakes
+        submerged = np.bincount(idx_riv, weights=inter_len, minlength=len(riv))
         # ------------------------------------------------------
         # CASE 1: No intersections → trivial correction
         # ------------------------------------------------------
-        if riv_int.empty:
-            riv["length_ratio"] = 1.0
-            riv["length"] = riv["length"]  # unchanged
-            riv = riv.drop(columns=["length_org"])
-            return riv
+        if not submerged.any():
+            return riv.assign(length_ratio=1.0)  # length unchanged
         # ------------------------------------------------------
-        # CASE 2: Compute how much of each COMID is inside lakes
+        # CASE 2: Length correction ratio
         # ------------------------------------------------------
-        riv_int["length_in_lake"] = riv_int.geometry.length
-        # Total submerged length per COMID
-        length_map = riv_int.groupby("COMID")["length_in_lake"].sum()
-        # submerged amount mapped to rivers
-        submerged = riv["COMID"].map(length_map).fillna(0)
-        # Length correction ratio
-        riv["length_ratio"] = (1 - submerged / riv["length_org"]).clip(0, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            length_ratio = np.clip(1 - submerged / length_org, 0, 1)
         # ------------------------------------------------------
         # GEOMETRY CORRECTION
         # ------------------------------------------------------
-        affected = riv["length_ratio"] < 1
+        affected = length_ratio < 1
         if affected.any():
-            # geometry minus lake
-            riv_diff =  self._shp1_shp2_overlay_info(riv, lake, how="difference")
-            diff_map = riv_diff.set_index("COMID").geometry
-            riv.loc[affected, "geometry"] = riv.loc[affected, "COMID"].map(diff_map)
+            # geometry minus lake, reusing the pairs of the affected rivers only
+            keep = affected[idx_riv]
+            riv_diff = self._pairs_difference(geom_riv, geom_lake, idx_riv[keep], idx_lake[keep])
+            geom[affected] = riv_diff[affected]
         # Fully submerged → drop geometry
-        riv.loc[riv["length_ratio"] == 0, "geometry"] = None
-        # Update corrected length
-        riv["length"] = riv["length"] * riv["length_ratio"]
-        # Cleanup
-        riv = riv.drop(columns=["length_org"])
-        return riv
+        geom[length_ratio == 0] = None
+        # Update corrected length (single write back)
+        return riv.assign(
+            geometry=geom,
+            length=riv["length"].to_numpy() * length_ratio,
+            length_ratio=length_ratio,
+        )
 
     def _clean_up(self, riv, cat):
         """
@@ -428,163 +530,161 @@ class NetworkTopologyCorrection:
              - update NextDownID
         6. Update riv.unitarea from cat.
         """
-        # -------------------------------------
-        # Copies
-        # -------------------------------------
-        riv = riv.copy()
-        cat = cat.copy()
-        lake = lake.copy()
+        # No up-front copies: riv/cat are only read until they are rebuilt by
+        # the stacking step, and lake is rebuilt before it gets new columns
         # -------------------------------------
         # 1. Intersect lakes with rivers
         # -------------------------------------
-        lake_riv = self._shp1_shp2_overlay_info(riv, lake, how="intersection")
+        # (river, lake) pairs from one STRtree query; like the intersection
+        # overlay, only pairs sharing a line part (length > 0) are kept
+        # (also reused by the river geometry correction below). The lake
+        # STRtree is built once and shared with the cat correction.
+        lake_index = self._geometry_index(lake)
+        riv_lake_pairs = self._riv_lake_pairs(riv, lake, index=lake_index)
+        _, _, idx_riv, idx_lake, inter_len = riv_lake_pairs
+        hit = inter_len > 0
+        lake_riv = pd.DataFrame({
+            "LakeCOMID": lake["LakeCOMID"].to_numpy()[idx_lake[hit]],
+            "COMID": riv["COMID"].to_numpy()[idx_riv[hit]],
+            "uparea": riv["uparea"].to_numpy()[idx_riv[hit]],
+        })
         if lake_riv.empty:
             # If no intersections: keep original lake order
             lake = lake.reset_index(drop=True)
         else:
-            # We only need lake geometry and intersecting river uparea
-            # Extract lake index using spatial join after overlay (robust)
-            lake_idx = gpd.sjoin(lake, lake_riv, how="left", predicate="intersects")
-            # lake_idx["uparea_right"] is the river uparea from lake_riv
-            # but depending on overlay version it may appear under different names.
-            # So detect the uparea column robustly:
-            uparea_col = [c for c in lake_idx.columns if "uparea" in c.lower()][0]
-            # Compute per-lake max uparea
-            lake_max_up = lake_idx.groupby(lake_idx.index)[uparea_col].max()
-            # Attach this temporary sorting column
-            lake["__sort_up__"] = lake_max_up
-            # Missing values → place at end
-            lake["__sort_up__"] = lake["__sort_up__"].fillna(float("inf"))
+            # The overlay already carries the lake id and the river uparea,
+            # so the per-lake max uparea is a plain groupby (no second sjoin)
+            lake_max_up = lake_riv.groupby("LakeCOMID")["uparea"].max()
+            # Sort key kept as a local array; missing values → place at end
+            sort_up = lake["LakeCOMID"].map(lake_max_up).fillna(float("inf")).to_numpy()
             # -------------------------------------
             # 2. Sort lakes by max upstream area
             # -------------------------------------
-            lake = lake.sort_values("__sort_up__").reset_index(drop=True)
-            # Remove temporary column
-            lake = lake.drop(columns="__sort_up__")
+            order = np.argsort(sort_up, kind="stable")
+            lake = lake.iloc[order].reset_index(drop=True)
         # -------------------------------------
         # 4. Stack lakes with riv and cat
         # -------------------------------------
-        cat_geometry_corrected = self._cat_geometry_correction(cat, lake)
-        riv_gemoetry_corrected = self._riv_geometry_correction(riv, lake)
+        cat_geometry_corrected = self._cat_geometry_correction(cat, lake, index=lake_index)
+        riv_gemoetry_corrected = self._riv_geometry_correction(riv, lake, pairs=riv_lake_pairs)
         # -------------------------------------
         # 3. Assign COMIDs to lakes after sorting
         # -------------------------------------
-        maxCOMID = max(riv["COMID"].max(), cat["COMID"].max())
+        maxCOMID = int(max(riv["COMID"].to_numpy().max(), cat["COMID"].to_numpy().max()))
         n_lakes = len(lake)
-        lake["COMID"] = list(range(maxCOMID + 1, maxCOMID + 1 + n_lakes))
-        lake["islake"] = 1
+        # match the riv COMID dtype so stacking does not upcast the column
+        lake = lake.assign(
+            COMID=np.arange(maxCOMID + 1, maxCOMID + 1 + n_lakes, dtype=np.int64).astype(
+                riv["COMID"].dtype, copy=False),
+            islake=1,
+        )
         # -------------------------------------
         # 4. Stack lakes with riv and cat
         # -------------------------------------
-        riv = pd.concat([riv, lake], ignore_index=True)
-        cat = pd.concat([cat, lake], ignore_index=True)
+        riv = pd.concat([riv, lake], ignore_index=True, copy=False)
+        cat = pd.concat([cat, lake], ignore_index=True, copy=False)
         # -------------------------------------
         # 5. Build the network topology
         # -------------------------------------
         riv["inflow"] = 0
         riv["outflow"] = 0
         riv["inoutflow"] = 0
-        for _, lk in lake.iterrows():
-            # Correct field name
-            lk_comid = lk["LakeCOMID"]
-            comid = lk["COMID"]
-            # ---- 1. Get intersecting rivers ----
-            riv_ids = lake_riv.loc[lake_riv["LakeCOMID"] == lk_comid, "COMID"].unique()
-            if len(riv_ids) == 0:
-                continue
-            # Mark inflow rivers
-            riv.loc[riv["COMID"].isin(riv_ids), "inflow"] = 1
-            # ---- 2. Exhoreic lake: identify single outflow ----
-            def is_exhoreic_flag(val):
-                """
-                Robustly check if lake is exhoreic.
-                Accepts int, float, string representations of 0/1.
-                Returns True only if val represents 1; False otherwise.
-                """
-                if val is None:
-                    return False
-                if pd.isna(val):
-                    return False
-                try:
-                    # convert to float first, then check if == 1
-                    return float(val) == 1
-                except (ValueError, TypeError):
-                    return False
-            if is_exhoreic_flag(lk.get("exorheic", 0)):
-                subset = riv.loc[riv["COMID"].isin(riv_ids)]
-                outflow_riv = subset.loc[subset["uparea"].idxmax(), "COMID"]
-                nextdownoutflow_riv = subset.loc[subset["uparea"].idxmax(), "NextDownCOMID"]
-                riv.loc[riv["COMID"].isin(riv_ids), "NextDownCOMID"] = comid
-                riv.loc[riv["COMID"] == outflow_riv, "outflow"] = 1
-                riv.loc[riv["COMID"] == outflow_riv, "inflow"] = 0
-                riv.loc[riv["COMID"] == outflow_riv, "NextDownCOMID"] = nextdownoutflow_riv
-                riv.loc[riv["LakeCOMID"] == lk_comid, "NextDownCOMID"] = outflow_riv
-            else:
-                riv.loc[riv["LakeCOMID"] == lk_comid, "NextDownCOMID"] = -9999 # for endorheic and exorheic
-                riv.loc[riv["COMID"].isin(riv_ids), "NextDownCOMID"] = comid
+        # Lakes are processed upstream → downstream, which is also the order
+        # of their new COMIDs. When a river touches several lakes the most
+        # downstream lake decides its final inflow flag and NextDownCOMID.
+        if "exorheic" in lake.columns:
+            # accepts int, float, string representations of 0/1; anything else → False
+            exorheic = pd.to_numeric(lake["exorheic"], errors="coerce").eq(1)
+        else:
+            exorheic = pd.Series(False, index=lake.index)
+        lake_info = pd.DataFrame({
+            "LakeCOMID": lake["LakeCOMID"].to_numpy(),
+            "lake_comid": lake["COMID"].to_numpy(),
+            "exorheic": exorheic.to_numpy(),
+        })
+        # ---- 1. Intersecting (lake, river) pairs ----
+        pairs = (
+            lake_riv[["LakeCOMID", "COMID"]]
+            .drop_duplicates()
+            .merge(lake_info, on="LakeCOMID", how="inner")
+        )
+        # COMID → row lookups below go through the sorted-key _align helper
+        riv_keys = riv["COMID"].to_numpy()
+        if not pairs.empty:
+            pairs["riv_pos"], _ = self._align(
+                riv_keys, np.arange(len(riv)), pairs["COMID"].to_numpy(), fill=-1)
+            pairs["uparea"] = riv["uparea"].to_numpy()[pairs["riv_pos"]]
+            # ---- 2. Exhoreic lake: single outflow = max uparea (first in riv order on ties) ----
+            pairs = pairs.sort_values(["lake_comid", "riv_pos"]).reset_index(drop=True)
+            outflow_idx = pairs.groupby("LakeCOMID")["uparea"].idxmax()
+            outflow_riv = pairs.loc[outflow_idx].set_index("LakeCOMID")["COMID"]
+            pairs["is_outflow"] = pairs["exorheic"] & (
+                pairs["COMID"] == pairs["LakeCOMID"].map(outflow_riv))
+            # ---- 3. River flags ----
+            # inflow: set by every lake, cleared by the lake the river drains
+            last_lake = pairs.groupby("COMID").tail(1)
+            drains, _ = self._align(
+                last_lake["COMID"].to_numpy(), last_lake["is_outflow"].to_numpy(), riv_keys, fill=True)
+            riv["inflow"] = (~drains).astype(int)
+            outflow_ids = pairs.loc[pairs["is_outflow"], "COMID"].to_numpy()
+            _, is_outflow = self._align(outflow_ids, outflow_ids, riv_keys)
+            riv["outflow"] = is_outflow.astype(int)
+            # ---- 4. River NextDownCOMID ----
+            # inflow rivers drain to the last lake they enter; an outflow river
+            # keeps the downstream it had before its own lake was processed
+            next_lake = pairs.loc[~pairs["is_outflow"]].groupby("COMID")["lake_comid"].max()
+            new_down, found = self._align(next_lake.index.to_numpy(), next_lake.to_numpy(), riv_keys, fill=-1)
+            riv.loc[found, "NextDownCOMID"] = new_down[found]
+            # ---- 5. Lake NextDownCOMID ----
+            # exorheic → its outflow river; endorheic → -9999
+            lake_down = outflow_riv.where(
+                lake_info.set_index("LakeCOMID")["exorheic"].reindex(outflow_riv.index), -9999)
+            lake_down_riv, lake_rows = self._align(
+                lake_down.index.to_numpy(), lake_down.to_numpy(), riv["LakeCOMID"].to_numpy(), fill=-1)
+            riv.loc[lake_rows, "NextDownCOMID"] = lake_down_riv[lake_rows]
         # -------------------------------------
         # 6. Update geometry and unit area for riv and cat
         # -------------------------------------
-        riv_corr_lookup = riv_gemoetry_corrected[riv_gemoetry_corrected["length_ratio"] < 1].set_index("COMID")
-        riv_geom_map = riv_corr_lookup["geometry"].to_dict()
-        riv_length_map = riv_corr_lookup["length"].to_dict()
-        riv_ratio_map = riv_corr_lookup["length_ratio"].to_dict()
-        # Lake geometries
-        lake_geom_map = lake.set_index("COMID")["geometry"].to_dict()
-        # --- Loop over riv ---
-        for idx, row in riv.iterrows():
-            comid = row["COMID"]
-            # 1. Check length_ratio from corrected rivers
-            length_ratio = riv_ratio_map.get(comid, 1)
-            # 2. Update geometry and length if length_ratio < 1
-            if length_ratio == 0:
-                # Fully submerged → geometry None, length 0
-                riv.at[idx, "geometry"] = None
-                riv.at[idx, "length"] = 0
-            elif length_ratio < 1:
-                geom = riv_geom_map.get(comid, None)
-                if geom is not None and geom.is_valid:
-                    riv.at[idx, "geometry"] = geom
-                length = riv_length_map.get(comid, None)
-                if length is not None:
-                    riv.at[idx, "length"] = length
-            # 3. Update geometry if this is a lake
-            if row.get("islake", 0) == 1:
-                geom = lake_geom_map.get(comid, None)
-                if geom is not None and geom.is_valid:
-                    riv.at[idx, "geometry"] = geom
+        # riv correction of geometry and length (aligned on COMID, no per-row loop)
+        riv_corr = riv_gemoetry_corrected.loc[riv_gemoetry_corrected["length_ratio"] < 1]
+        corr_keys = riv_corr["COMID"].to_numpy()
+        length_ratio, _ = self._align(corr_keys, riv_corr["length_ratio"].to_numpy(), riv_keys, fill=1.0)
+        submerged = length_ratio == 0
+        partial = (length_ratio > 0) & (length_ratio < 1)
+        # Partially submerged → corrected length, and corrected geometry if valid
+        riv_geom, _ = self._align(corr_keys, riv_corr.geometry.to_numpy(), riv_keys)
+        geom_ok = partial & shapely.is_valid(riv_geom)
+        riv_length, _ = self._align(corr_keys, riv_corr["length"].to_numpy(), riv_keys, fill=np.nan)
+        # Fully submerged → geometry None, length 0 (single write per column)
+        geom = riv.geometry.values.copy()
+        geom[geom_ok] = riv_geom[geom_ok]
+        geom[submerged] = None
+        riv["geometry"] = geom
+        riv["length"] = np.where(partial, riv_length,
+                                 np.where(submerged, 0, riv["length"].to_numpy()))
+        # (lake rows already carry the lake geometry from the stacking step)
         # cat correction of geometry and unitarea
-        # Prepare lookup maps from corrected CAT
-        cat_lookup = cat_geometry_corrected.set_index("COMID")
-        cat_geom_map = cat_lookup["geometry"].to_dict()
-        cat_area_map = cat_lookup["unitarea"].to_dict()
-        cat_ratio_map = cat_lookup.get("area_ratio", pd.Series(1, index=cat_lookup.index)).to_dict()
-        # Loop over CAT to update geometry and unitarea
-        for idx, row in cat.iterrows():
-            comid = row["COMID"]
-            # Get area_ratio
-            area_ratio = cat_ratio_map.get(comid, 1)
-            if area_ratio == 0:
-                # Fully removed → geometry None, unitarea 0
-                cat.at[idx, "geometry"] = None
-                cat.at[idx, "unitarea"] = 0
-            else:
-                # Update geometry from corrected CAT if available and valid
-                geom = cat_geom_map.get(comid, None)
-                if geom is not None and geom.is_valid:
-                    cat.at[idx, "geometry"] = geom
-                # Update unitarea from corrected CAT
-                unitarea = cat_area_map.get(comid, None)
-                if unitarea is not None:
-                    cat.at[idx, "unitarea"] = unitarea
-        # pass the unit area from cat to riv
-        # first set the unitarea to zero in the riv
-        # Build lookup from corrected CAT
-        cat_unit_map = cat.set_index("COMID")["unitarea"]
-        # Map CAT.unitarea → RIV.unitarea
-        riv["unitarea"] = riv["COMID"].map(cat_unit_map)
-        # Replace missing or NaN with 0
-        riv["unitarea"] = riv["unitarea"].fillna(0)
+        cat_keys = cat["COMID"].to_numpy()
+        corr_keys = cat_geometry_corrected["COMID"].to_numpy()
+        area_ratio, in_corr = self._align(
+            corr_keys, cat_geometry_corrected["area_ratio"].to_numpy(), cat_keys, fill=np.nan)
+        removed = area_ratio == 0
+        # Update geometry and unitarea from corrected CAT (geometry only if valid)
+        cat_geom, _ = self._align(corr_keys, cat_geometry_corrected.geometry.to_numpy(), cat_keys)
+        geom_ok = ~removed & shapely.is_valid(cat_geom)
+        cat_area, _ = self._align(
+            corr_keys, cat_geometry_corrected["unitarea"].to_numpy(), cat_keys, fill=np.nan)
+        area_ok = in_corr & ~removed
+        # Fully removed → geometry None, unitarea 0 (single write per column)
+        geom = cat.geometry.values.copy()
+        geom[geom_ok] = cat_geom[geom_ok]
+        geom[removed] = None
+        cat["geometry"] = geom
+        cat["unitarea"] = np.where(area_ok, cat_area,
+                                   np.where(removed, 0, cat["unitarea"].to_numpy()))
+        # pass the unit area from cat to riv (missing or NaN → 0)
+        riv_area, _ = self._align(cat_keys, cat["unitarea"].to_numpy(), riv_keys, fill=np.nan)
+        riv["unitarea"] = np.nan_to_num(riv_area, nan=0.0)
         # add the inoutflow
         riv["inoutflow"] = ((riv["inflow"] == 1) & (riv["outflow"] == 1)).astype(int)
         # clean up
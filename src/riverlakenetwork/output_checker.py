@@ -1,5 +1,5 @@
+import numpy as np
 import pandas as pd
-from collections import defaultdict
 import warnings
 from .utility import Utility
 
@@ -18,6 +18,7 @@ class OutputChecker:
         self.riv_org = riv_org
         self.cat = cat
         self.lake = lake
+        self._cache_invariants()
         self._check_lake_outlet_graph_simple()
         self._check_inoutflow_length()
         has_loop = Utility.check_network_loops(riv=self.riv, mapping={"id": "COMID", "next_id": "NextDownCOMID"})
@@ -25,17 +26,56 @@ class OutputChecker:
     # --------------------------------------------------
     # Internal helpers
     # --------------------------------------------------
+    def _cache_invariants(self):
+        """
+        Compute the column lists and int64 COMID casts used by the checks
+        once per instance. Missing columns are left as None; the checks
+        report them.
+        """
+        riv, lake = self.riv, self.lake
+        self._riv_columns = frozenset(riv.columns)
+        # Upstream columns (up1, up2, ...)
+        self._up_cols = [c for c in riv.columns if c.lower().startswith("up")]
+        self._riv_comid_i64 = (riv["COMID"].to_numpy(dtype=np.int64, na_value=-1)
+                               if "COMID" in self._riv_columns else None)
+        self._riv_islake_i64 = (riv["islake"].to_numpy(dtype=np.int64, na_value=0)
+                                if "islake" in self._riv_columns else None)
+        self._lake_comid_i64 = None
+        self._lake_by_comid = None
+        if lake is not None and {"COMID", "LakeCOMID"} <= set(lake.columns):
+            self._lake_comid_i64 = lake["COMID"].to_numpy(dtype=np.int64, na_value=-1)
+            # Lake rows indexed by int64 COMID (row position keeps table order)
+            self._lake_by_comid = pd.DataFrame(
+                {"lake_row": np.arange(len(lake)), "LakeCOMID": lake["LakeCOMID"].to_numpy()},
+                index=pd.Index(self._lake_comid_i64, name="nb"),
+            )
+
     @staticmethod
-    def _build_upstream_graph(riv, comid_col="COMID", down_col="NextDownCOMID"):
+    def _build_upstream_graph(riv, comid_col="COMID", down_col="NextDownCOMID", downstream=None,
+                              as_array=False):
         """
         Build upstream connectivity graph:
         downstream COMID -> set(upstream COMIDs)
+
+        Returned as a Series indexed by downstream COMID (supports ``.get``).
+        If `downstream` is given, only those downstream COMIDs are built.
+        If `as_array` is True, the upstream COMIDs are sorted unique ndarrays
+        instead of sets.
         """
-        upstream = defaultdict(set)
-        for comid, down in zip(riv[comid_col], riv[down_col]):
-            if pd.notna(down) and down > 0:
-                upstream[down].add(comid)
-        return upstream
+        down = riv[down_col]
+        mask = down.notna() & (down > 0)
+        if downstream is not None:
+            mask &= down.isin(downstream)
+        sub = riv.loc[mask, [down_col, comid_col]]
+        if as_array:
+            # One sort, then split the COMIDs at each downstream change
+            sub = sub.drop_duplicates().sort_values([down_col, comid_col])
+            keys, starts = np.unique(sub[down_col].to_numpy(), return_index=True)
+            parts = np.empty(len(keys), dtype=object)
+            for k, part in enumerate(np.split(sub[comid_col].to_numpy(), starts[1:]) if len(keys) else []):
+                parts[k] = part
+            return pd.Series(parts, index=keys)
+        return sub.groupby(down_col)[comid_col].agg(set)
 
     # --------------------------------------------------
     # Checks
@@ -45,40 +85,37 @@ class OutputChecker:
         Ensure upstream(riv) ⊆ upstream(riv_org)
         for outlet COMIDs (NextDownCOMID <= 0).
         """
-        up_new = self._build_upstream_graph(self.riv)
-        up_org = self._build_upstream_graph(self.riv_org)
+        riv, riv_org = self.riv, self.riv_org
         # Identify outlet COMIDs in riv
-        outlet_comids = set(
-            self.riv.loc[
-                (self.riv["NextDownCOMID"].isna()) |
-                (self.riv["NextDownCOMID"] <= 0),
-                "COMID"
-            ]
-        )
+        outlet_comids = riv.loc[
+            (riv["NextDownCOMID"].isna()) |
+            (riv["NextDownCOMID"] <= 0),
+            "COMID"
+        ]
         # Only compare COMIDs existing in both datasets
-        outlet_comids &= set(self.riv_org["COMID"])
-        violations = {}
-        for comid in outlet_comids:
-            new_up = up_new.get(comid, set())
-            org_up = up_org.get(comid, set())
-            if not new_up.issubset(org_up):
-                violations[comid] = {
-                    "extra_upstream": new_up - org_up,
-                    "riv_upstream": new_up,
-                    "riv_org_upstream": org_up,
-                }
-        if violations:
-            example = next(iter(violations))
-            msg = (
-                f"River network topology check failed.\n"
-                f"- Checked outlet COMIDs: {len(outlet_comids)}\n"
-                f"- Violations found: {len(violations)}\n\n"
-                f"Example violation:\n"
-                f"  COMID {example}\n"
-                f"  Extra upstream in riv: {violations[example]['extra_upstream']}"
-            )
-            print(msg)
-            # raise ValueError(msg)
+        outlet_comids = outlet_comids[outlet_comids.isin(riv_org["COMID"])].unique()
+        # Upstream edges (NextDownCOMID, COMID) draining into the outlets
+        cols = ["NextDownCOMID", "COMID"]
+        new_edges = riv.loc[riv["NextDownCOMID"].isin(outlet_comids), cols].drop_duplicates()
+        org_edges = riv_org.loc[riv_org["NextDownCOMID"].isin(outlet_comids), cols]
+        # Edges only present in riv violate upstream(riv) ⊆ upstream(riv_org);
+        # one hashed membership test, and nothing more when all edges exist
+        known = pd.MultiIndex.from_frame(new_edges).isin(pd.MultiIndex.from_frame(org_edges))
+        if known.all():
+            return
+        extra = new_edges[~known]
+        example = extra["NextDownCOMID"].min()
+        extra_up = set(extra.loc[extra["NextDownCOMID"] == example, "COMID"].tolist())
+        msg = (
+            f"River network topology check failed.\n"
+            f"- Checked outlet COMIDs: {len(outlet_comids)}\n"
+            f"- Violations found: {extra['NextDownCOMID'].nunique()}\n\n"
+            f"Example violation:\n"
+            f"  COMID {int(example)}\n"
+            f"  Extra upstream in riv: {extra_up}"
+        )
+        print(msg)
+        # raise ValueError(msg)
 
     def _check_graph_with_lakes(self):
         """
@@ -90,10 +127,6 @@ class OutputChecker:
         - Report LakeCOMIDs involved in violations
         """
 
-        # Build upstream graphs
-        up_new = self._build_upstream_graph(self.riv)
-        up_org = self._build_upstream_graph(self.riv_org)
-
         riv = self.riv
         riv_org = self.riv_org
 
@@ -112,23 +145,28 @@ class OutputChecker:
         # Only compare outlets existing in both datasets
         outlet_comids &= riv_org_comids
 
+        # Build upstream graphs (outlets only; sorted int arrays, not sets)
+        up_new = self._build_upstream_graph(riv, downstream=outlet_comids, as_array=True)
+        up_org = self._build_upstream_graph(riv_org, downstream=outlet_comids, as_array=True)
+        none = np.empty(0, dtype=np.int64)
+
         violations = {}
         lake_comids_all = set()
 
         for comid in outlet_comids:
-            new_up = up_new.get(comid, set())
-            org_up = up_org.get(comid, set())
+            new_up = up_new.get(comid, none)
+            org_up = up_org.get(comid, none)
 
-            if new_up.issubset(org_up):
+            extra_up = np.setdiff1d(new_up, org_up, assume_unique=True)
+            if extra_up.size == 0:
                 continue
 
-            extra_up = new_up - org_up
             lake_upstream = {}
 
             # -----------------------------------------
             # Scan all upstream slots (up1..upN)
             # -----------------------------------------
-            for upc in extra_up:
+            for upc in extra_up.tolist():
                 if upc not in riv_idx.index:
                     continue
 
@@ -171,7 +209,7 @@ class OutputChecker:
 
             for comid, info in violations.items():
                 print(f"Outlet COMID {comid}")
-                print(f"  Extra upstream COMIDs: {sorted(info['extra_upstream'])}")
+                print(f"  Extra upstream COMIDs: {info['extra_upstream'].tolist()}")
 
                 if info["lake_related_upstream"]:
                     print("  Lake-related upstream segments:")
@@ -203,7 +241,12 @@ class OutputChecker:
         up_riv = self._build_upstream_graph(riv)
         up_org = self._build_upstream_graph(riv_org)
 
-        riv_idx = riv.set_index("COMID")
+        # Keyed lookups built once (no per-COMID .loc row access):
+        # all COMIDs, the non-lake COMIDs, and direct upstreams in row order
+        missing = pd.Series(np.nan, index=riv.index)
+        riv_comids = set(riv["COMID"].tolist())
+        non_lake_comids = set(riv.loc[(riv.get("islake", missing) != 1).to_numpy(), "COMID"].tolist())
+        direct_up_by_down = riv.groupby("NextDownCOMID", sort=False)["COMID"].agg(list)
 
         violations = []
         violated_lake_ids = set()
@@ -211,23 +254,23 @@ class OutputChecker:
         # --------------------------------------------------
         # Loop over lake segments
         # --------------------------------------------------
-        for _, lake_row in riv.iterrows():
-
-            if lake_row.get("islake") != 1:
-                continue
-
-            if lake_row.get("exoheic") != 1:
-                continue
-
-            lake_comid = int(lake_row["COMID"])
-            lake_id = lake_row.get("LakeCOMID")
-
-            outlet = lake_row.get("NextDownCOMID")
-            if pd.isna(outlet) or outlet <= 0:
-                continue
-
+        # Prefilter exorheic lake segments with a downstream outlet once
+        # (vectorized masks instead of per-row scalar checks)
+        down = riv.get("NextDownCOMID", missing)
+        is_lake_outlet = (
+            (riv.get("islake", missing) == 1)
+            & (riv.get("exoheic", missing) == 1)
+            & down.notna() & (down > 0)
+        ).to_numpy()
+        lake_rows = riv[is_lake_outlet]
+        lake_ids = lake_rows["LakeCOMID"].tolist() if "LakeCOMID" in riv.columns else [None] * len(lake_rows)
+
+        for lake_comid, lake_id, outlet in zip(lake_rows["COMID"].tolist(), lake_ids,
+                                               lake_rows["NextDownCOMID"].tolist()):
+
+            lake_comid = int(lake_comid)
             outlet = int(outlet)
-            if outlet not in riv_idx.index:
+            if outlet not in riv_comids:
                 continue
 
             # --------------------------------------------------
@@ -236,10 +279,7 @@ class OutputChecker:
             upstream_riv = up_riv.get(outlet, set())
             upstream_org = up_org.get(outlet, set())
 
-            upstream_riv_non_lake = {
-                c for c in upstream_riv
-                if c in riv_idx.index and riv_idx.loc[c].get("islake") != 1
-            }
+            upstream_riv_non_lake = {c for c in upstream_riv if c in non_lake_comids}
 
             # --------------------------------------------------
             # Check 1: upstream subset condition
@@ -257,12 +297,9 @@ class OutputChecker:
             # --------------------------------------------------
             # Check 2: outlet has only lake as direct upstream
             # --------------------------------------------------
-            direct_up = riv.loc[riv["NextDownCOMID"] == outlet, "COMID"].tolist()
+            direct_up = direct_up_by_down.get(outlet, [])
 
-            non_lake_direct = [
-                c for c in direct_up
-                if c in riv_idx.index and riv_idx.loc[c].get("islake") != 1
-            ]
+            non_lake_direct = [c for c in direct_up if c in non_lake_comids]
 
             if non_lake_direct:
                 violations.append({
@@ -277,7 +314,7 @@ class OutputChecker:
             # --------------------------------------------------
             # Check 3: outlet appears only once in NextDownCOMID
             # --------------------------------------------------
-            count_down = (riv["NextDownCOMID"] == outlet).sum()
+            count_down = len(direct_up)
 
             if count_down > 1:
                 violations.append({
@@ -329,15 +366,14 @@ class OutputChecker:
         to a downstream lake.
         """
         required = {"COMID", "NextDownCOMID", "inoutflow", "length"}
-        missing = required - set(self.riv.columns)
+        missing = required - self._riv_columns
         if missing:
             raise ValueError(f"Missing required columns in riv: {missing}")
         if self.lake is None or "LakeCOMID" not in self.lake.columns:
             raise ValueError("Lake dataframe with 'LakeCOMID' is required.")
         if "islake" not in self.riv.columns:
             raise ValueError("riv must contain 'islake' flag.")
-        # Identify upstream columns (up1, up2, ...)
-        up_cols = [c for c in self.riv.columns if c.lower().startswith("up")]
+        up_cols = self._up_cols
         # Identify problematic in/outflow links
         bad_links = self.riv[
             (self.riv["inoutflow"] == 1)
@@ -347,51 +383,60 @@ class OutputChecker:
             )
         ]
         # print(bad_links)
-        for _, row in bad_links.iterrows():
-            comid = int(row["COMID"])
-            # -------------------------------------------------
-            # 1. Collect related COMIDs (up* + NextDownCOMID)
-            # -------------------------------------------------
-            related = set()
-            down = row["NextDownCOMID"]
-            if pd.notna(down) and down > 0:
-                related.add(int(down))
-            for col in up_cols:
-                val = row[col]
-                if pd.notna(val) and val > 0:
-                    related.add(int(val))
-            if not related:
-                continue
-            # -------------------------------------------------
-            # 2. Slice riv once and keep only lake segments
-            # -------------------------------------------------
-            riv_slice = self.riv.loc[
-                self.riv["COMID"].astype("Int64").isin(related)
-                & (self.riv["islake"].astype("Int64") == 1)
-            ]
-            if riv_slice.empty:
-                continue
-            # -------------------------------------------------
-            # 3. Resolve LakeCOMID from lake table
-            # -------------------------------------------------
-            lakes_comids = riv_slice["COMID"].astype(int).tolist()
-            lake_slice = self.lake.loc[
-                self.lake["COMID"].astype("Int64").isin(lakes_comids)
-            ]
-            lakes_ids = lake_slice["LakeCOMID"].astype(int).tolist()
-            # -------------------------------------------------
-            # 4. Warn only if lake–lake connector
-            # -------------------------------------------------
-            if len(lakes_comids) >= 2:
-                print(
-                    "\n[WARNING] Lake–lake in/outflow connector with near-zero length detected:\n"
-                    f"  River COMID          : {comid}\n"
-                    f"  length               : {row['length']}\n"
-                    f"  Connected Lake IDs   : {lakes_ids}\n"
-                    f"  Connected Lake COMIDs: {lakes_comids}\n"
-                    "  Interpretation       : This river segment links two hydrologically\n"
-                    "                         connected lakes that are represented as separate\n"
-                    "                         features (e.g., Lake Michigan–Lake Huron).\n"
-                    "  Recommended fix      : Merge or correct the lake geometries in the\n"
-                    "                         lake shapefile and rerun the scripts.\n"
-                )
\ No newline at end of file
+        if bad_links.empty:
+            return
+        # COMIDs/flags cast once in _cache_invariants
+        riv_comid = self._riv_comid_i64
+        riv_islake = self._riv_islake_i64
+        comid_arr = bad_links["COMID"].to_numpy()
+        length_arr = bad_links["length"].to_numpy()
+        # -------------------------------------------------
+        # 1. Long table of related COMIDs (NextDownCOMID + up*) per bad link
+        # -------------------------------------------------
+        related = bad_links[["NextDownCOMID"] + up_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = related > 0
+        link, _ = np.nonzero(valid)
+        neighbors = pd.DataFrame({"link": link, "nb": related[valid].astype(np.int64)}).drop_duplicates()
+        # -------------------------------------------------
+        # 2. Join with the lake segments of riv (row position keeps table order)
+        # -------------------------------------------------
+        riv_lakes = pd.DataFrame({"nb": riv_comid, "riv_row": np.arange(len(riv_comid))})[riv_islake == 1]
+        nb_lake = neighbors.merge(riv_lakes, on="nb")
+        # -------------------------------------------------
+        # 3. Warn only if lake–lake connector (two or more lake neighbours)
+        # -------------------------------------------------
+        n_lakes = nb_lake.groupby("link").size()
+        connectors = n_lakes.index[n_lakes >= 2]
+        if connectors.empty:
+            return
+        nb_lake = nb_lake[nb_lake["link"].isin(connectors)].sort_values(["link", "riv_row"])
+        # -------------------------------------------------
+        # 4. Resolve LakeCOMID from lake table
+        # -------------------------------------------------
+        if self._lake_by_comid is None:
+            raise ValueError("Lake dataframe with 'COMID' is required.")
+        nb_lake_ids = (nb_lake[["link", "nb"]]
+                       .merge(self._lake_by_comid, left_on="nb", right_index=True)
+                       .sort_values(["link", "lake_row"]))
+        comids_by_link = nb_lake.groupby("link")["nb"].agg(lambda v: v.tolist())
+        ids_by_link = nb_lake_ids.groupby("link")["LakeCOMID"].agg(lambda v: [int(x) for x in v])
+        # Collect the warnings and write them in one go
+        records = []
+        for i in connectors:
+            comid = int(comid_arr[i])
+            lakes_comids = comids_by_link[i]
+            lakes_ids = ids_by_link.get(i, [])
+            records.append(
+                "\n[WARNING] Lake–lake in/outflow connector with near-zero length detected:\n"
+                f"  River COMID          : {comid}\n"
+                f"  length               : {length_arr[i]}\n"
+                f"  Connected Lake IDs   : {lakes_ids}\n"
+                f"  Connected Lake COMIDs: {lakes_comids}\n"
+                "  Interpretation       : This river segment links two hydrologically\n"
+                "                         connected lakes that are represented as separate\n"
+                "                         features (e.g., Lake Michigan–Lake Huron).\n"
+                "  Recommended fix      : Merge or correct the lake geometries in the\n"
+                "                         lake shapefile and rerun the scripts.\n"
+                "\n"
+            )
+        print("".join(records), end="")
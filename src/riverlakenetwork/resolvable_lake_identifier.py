@@ -1,7 +1,9 @@
 import geopandas as gpd
-from   shapely.geometry import Point, LineString, MultiLineString
+from   shapely.geometry import Point, LineString
 from   shapely.ops import unary_union
+import shapely
 import pandas as pd
+import numpy as np
 from   .utility import Utility   # adjust path if needed
 
 
@@ -30,9 +32,11 @@ class ResolvableLakes:
         lake_cleaned = self._remove_inbasin_lakes(cat, lake_subset)
         print(f"==== Number of lakes after removing intersection with only one lake: {len(lake_cleaned)} ====")
         # --- Step 3: remove lakes that are not touching river starting or ending point ---
-        lake_cleaned = self._keep_lakes_touching_river_endpoints(riv, lake_cleaned)
+        # (endpoints and their spatial index are shared by both endpoint steps)
+        endpoints = self._river_endpoints_gdf(riv)
+        lake_cleaned = self._keep_lakes_touching_river_endpoints(riv, lake_cleaned, endpoints)
         print(f"==== Number of lakes after removing lakes that do not touch starting or ending points of river segments: {len(lake_cleaned)} ====")
-        lake_cleaned = self._remove_lakes_touching_only_one_river_endpoint(riv, lake_cleaned)
+        lake_cleaned = self._remove_lakes_touching_only_one_river_endpoint(riv, lake_cleaned, endpoints)
         print(f"==== Number of lakes after removing lakes that do touch only one starting or ending points of river segments: {len(lake_cleaned)} ====")
         river_lake_int = self._river_lake_intersection_info(riv, lake_cleaned)
         lake_cleaned, river_lake_int_filtered = self._remove_lakes_int_with_one_river_segment(lake_cleaned, river_lake_int)
@@ -70,18 +74,15 @@ class ResolvableLakes:
         GeoDataFrame
             Filtered lake dataset
         """
-        # --- 1. Compute lake centroids ---
-        lake = lake.copy()
-        lake_centroids = lake.geometry.centroid
-        lake["x"], lake["y"] = lake_centroids.x, lake_centroids.y
+        # --- 1. Compute lake centroids (NaN for null/empty geometries) ---
+        lake_centroids = shapely.centroid(lake.geometry.to_numpy())
+        x, y = shapely.get_x(lake_centroids), shapely.get_y(lake_centroids)
         # --- 2. Catchment bounding box with margin ---
         minx, miny, maxx, maxy = cat.total_bounds
         minx, miny, maxx, maxy = minx - margin, miny - margin, maxx + margin, maxy + margin
         # --- 3. Fast filter lakes by centroid within bounding box ---
-        lake_filtered = lake[
-            (lake["x"] >= minx) & (lake["x"] <= maxx) &
-            (lake["y"] >= miny) & (lake["y"] <= maxy)
-        ]
+        mask = (x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy)
+        lake_filtered = lake.iloc[np.flatnonzero(mask)]
         # --- 4a. Spatial intersection with catchments ---
         intersected = gpd.sjoin(lake_filtered, cat, how="inner", predicate="intersects")
         # print(intersected.columns)
@@ -121,7 +122,7 @@ class ResolvableLakes:
         """
         Remove lakes that lie entirely within a single subbasin.
         Logic:
-        - Perform a spatial intersection between catchments and lakes.
+        - Query the catchments whose area each lake overlaps.
         - Count how many catchments each lake intersects.
         - If a lake intersects only one catchment, it is considered 'in-basin only'
           and is removed.
@@ -138,21 +139,65 @@ class ResolvableLakes:
         """
         if "LakeCOMID" not in lake.columns:
             raise ValueError("lake GeoDataFrame must contain a 'LakeCOMID' column")
-        # Spatial intersection
-        cat_lake_int = gpd.overlay(cat, lake, how="intersection")
-        if "LakeCOMID" not in cat_lake_int.columns:
-            raise ValueError("Spatial intersection did not retain 'LakeCOMID' column")
+        # Spatial query (predicate only, no intersection geometries are built);
+        # reuses the catchment index cached by the sjoin in _subset_lake
+        lake_geom = lake.geometry.to_numpy()
+        idx_lake, idx_cat = cat.sindex.query(lake_geom, predicate="intersects")
+        # Boundary-only contacts have no overlapping area, as with overlay
+        touching = shapely.touches(lake_geom[idx_lake], cat.geometry.to_numpy()[idx_cat])
         # Count how many catchments each lake touches
-        lake_counts = cat_lake_int["LakeCOMID"].value_counts()
+        lake_counts = pd.Series(lake["LakeCOMID"].to_numpy()[idx_lake[~touching]]).value_counts()
         # Lakes that appear exactly once are “entirely in one basin”
         single_occurrence_ids = lake_counts[lake_counts == 1].index.tolist()
         # Remove them
         filtered_lake = lake[~lake["LakeCOMID"].isin(single_occurrence_ids)].reset_index(drop=True)
         return filtered_lake
 
+    @staticmethod
+    def _river_endpoints(riv: gpd.GeoDataFrame):
+        """
+        Start and end points of each river segment.
+
+        The start point is the first vertex of the (first) line and the end
+        point the last vertex of the (last) line; geometries that are not
+        (Multi)LineStrings, or are null/empty, get None.
+
+        Returns
+        -------
+        (start_pts, end_pts) : tuple of numpy object arrays of Points
+        """
+        geom = riv.geometry.to_numpy()
+        coords = shapely.get_coordinates(geom)
+        counts = shapely.get_num_coordinates(geom)
+        ends = np.cumsum(counts) - 1
+        starts = ends - counts + 1
+        # LineString, LinearRing, MultiLineString
+        is_line = np.isin(shapely.get_type_id(geom), [1, 2, 5]) & (counts > 0)
+        start_pts = np.full(len(geom), None, dtype=object)
+        end_pts = np.full(len(geom), None, dtype=object)
+        start_pts[is_line] = shapely.points(coords[starts[is_line]])
+        end_pts[is_line] = shapely.points(coords[ends[is_line]])
+        return start_pts, end_pts
+
+    def _river_endpoints_gdf(self, riv: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        """
+        Start and end points of the river segments stacked in one
+        GeoDataFrame, each tagged with its COMID. Null or empty river
+        geometries are skipped. The spatial index built on the first
+        sjoin against it is cached on the frame, so pass the same frame
+        to every endpoint step.
+        """
+        # Remove null or empty geometries (the selection is already a new frame)
+        riv = riv[riv.geometry.notnull() & ~riv.geometry.is_empty]
+        start_pts, end_pts = self._river_endpoints(riv)
+        comid = riv["COMID"].to_numpy()
+        return gpd.GeoDataFrame({"COMID": np.concatenate([comid, comid])},
+                                geometry=np.concatenate([start_pts, end_pts]), crs=riv.crs)
+
     def _keep_lakes_touching_river_endpoints(self,
                                              riv: gpd.GeoDataFrame,
-                                             lake: gpd.GeoDataFrame):
+                                             lake: gpd.GeoDataFrame,
+                                             endpoints: gpd.GeoDataFrame = None):
         """
         Keep only lakes that intersect with the start or end points of river segments.
         Handles rivers with None or empty geometries.
@@ -163,57 +208,27 @@ class ResolvableLakes:
             River linestrings with at least geometry + COMID.
         lake : GeoDataFrame
             Lake polygons containing LakeCOMID.
+        endpoints : GeoDataFrame, optional
+            Output of `_river_endpoints_gdf(riv)`, to reuse its spatial index.
 
         Returns
         -------
         GeoDataFrame
             Filtered lake GeoDataFrame
         """
-        riv = riv.copy()
-        # Remove null or empty geometries
-        riv = riv[riv.geometry.notnull() & ~riv.geometry.is_empty].reset_index(drop=True)
-        # Extract start and end points safely
-        # def get_start_pt(g):
-        #     return Point(g.coords[0]) if g and g.coords else None
-        # def get_end_pt(g):
-        #     return Point(g.coords[-1]) if g and g.coords else None
-        def get_start_pt(g):
-            if g is None or g.is_empty:
-                return None
-            if isinstance(g, LineString):
-                return Point(g.coords[0])
-            if isinstance(g, MultiLineString):
-                # take first coordinate of first line
-                first_line = list(g.geoms)[0]
-                return Point(first_line.coords[0])
-            return None
-        def get_end_pt(g):
-            if g is None or g.is_empty:
-                return None
-            if isinstance(g, LineString):
-                return Point(g.coords[-1])
-            if isinstance(g, MultiLineString):
-                # take last coordinate of last line
-                last_line = list(g.geoms)[-1]
-                return Point(last_line.coords[-1])
-            return None
-        riv["start_pt"] = riv.geometry.apply(get_start_pt)
-        riv["end_pt"]   = riv.geometry.apply(get_end_pt)
-        # Convert start/end points to GeoDataFrames
-        start_gdf = gpd.GeoDataFrame(riv[["COMID"]], geometry=riv["start_pt"], crs=riv.crs)
-        end_gdf   = gpd.GeoDataFrame(riv[["COMID"]], geometry=riv["end_pt"], crs=riv.crs)
-        # Spatial join start points with lakes
-        start_join = gpd.sjoin(start_gdf, lake, how="inner", predicate="intersects")
-        end_join   = gpd.sjoin(end_gdf, lake, how="inner", predicate="intersects")
-        # Combine LakeCOMID from start and end joins
-        keep_ids = pd.Index(start_join["LakeCOMID"].tolist() +
-                            end_join["LakeCOMID"].tolist()).unique()
+        if endpoints is None:
+            endpoints = self._river_endpoints_gdf(riv)
+        # Spatial join lakes with the start and end points in one query
+        joined = gpd.sjoin(lake[["LakeCOMID", "geometry"]], endpoints,
+                           how="inner", predicate="intersects")
+        keep_ids = joined["LakeCOMID"].unique()
         filtered_lake = lake[lake["LakeCOMID"].isin(keep_ids)].reset_index(drop=True)
         return filtered_lake
 
     def _remove_lakes_touching_only_one_river_endpoint(self,
                                                        riv: gpd.GeoDataFrame,
-                                                       lake: gpd.GeoDataFrame):
+                                                       lake: gpd.GeoDataFrame,
+                                                       endpoints: gpd.GeoDataFrame = None):
         """
         Remove lakes that touch only one river segment at their start or end points.
         Only lakes touching two or more river segments at endpoints are kept.
@@ -224,53 +239,21 @@ class ResolvableLakes:
             River linestrings with at least geometry + COMID.
         lake : GeoDataFrame
             Lake polygons containing LakeCOMID.
+        endpoints : GeoDataFrame, optional
+            Output of `_river_endpoints_gdf(riv)`, to reuse its spatial index.
 
         Returns
         -------
         GeoDataFrame
             Filtered lake GeoDataFrame
         """
-        riv = riv.copy()
-        # Remove null or empty geometries
-        riv = riv[riv.geometry.notnull() & ~riv.geometry.is_empty].reset_index(drop=True)
-        # Extract start and end points safely
-        # def get_start_pt(g):
-        #     return Point(g.coords[0]) if g and g.coords else None
-        # def get_end_pt(g):
-        #     return Point(g.coords[-1]) if g and g.coords else None
-        def get_start_pt(g):
-            if g is None or g.is_empty:
-                return None
-            if isinstance(g, LineString):
-                return Point(g.coords[0])
-            if isinstance(g, MultiLineString):
-                # take first coordinate of first line
-                first_line = list(g.geoms)[0]
-                return Point(first_line.coords[0])
-            return None
-        def get_end_pt(g):
-            if g is None or g.is_empty:
-                return None
-            if isinstance(g, LineString):
-                return Point(g.coords[-1])
-            if isinstance(g, MultiLineString):
-                # take last coordinate of last line
-                last_line = list(g.geoms)[-1]
-                return Point(last_line.coords[-1])
-            return None
-        riv["start_pt"] = riv.geometry.apply(get_start_pt)
-        riv["end_pt"]   = riv.geometry.apply(get_end_pt)
-        # Convert start/end points to GeoDataFrames
-        start_gdf = gpd.GeoDataFrame(riv[["COMID"]], geometry=riv["start_pt"], crs=riv.crs)
-        end_gdf   = gpd.GeoDataFrame(riv[["COMID"]], geometry=riv["end_pt"], crs=riv.crs)
-        # Spatial join start/end points with lakes
-        start_join = gpd.sjoin(start_gdf, lake, how="inner", predicate="intersects")
-        end_join   = gpd.sjoin(end_gdf, lake, how="inner", predicate="intersects")
-        # Combine start/end joins
-        combined = pd.concat([start_join[["LakeCOMID", "COMID"]],
-                              end_join[["LakeCOMID", "COMID"]]])
+        if endpoints is None:
+            endpoints = self._river_endpoints_gdf(riv)
+        # Spatial join lakes with the start and end points in one query
+        combined = gpd.sjoin(lake[["LakeCOMID", "geometry"]], endpoints,
+                             how="inner", predicate="intersects")
         # Count number of unique river segments per lake
-        seg_count = combined.groupby("LakeCOMID")["COMID"].nunique()
+        seg_count = combined.drop_duplicates(["LakeCOMID", "COMID"])["LakeCOMID"].value_counts()
         # Keep lakes that touch at least 2 river segments at endpoints
         keep_ids = seg_count[seg_count > 1].index.tolist()
         filtered_lake = lake[lake["LakeCOMID"].isin(keep_ids)].reset_index(drop=True)
@@ -306,8 +289,11 @@ class ResolvableLakes:
         Computes basic intersection summary between rivers and lakes.
 
         - Drops river and lake features with null or empty geometries
-        - Computes river–lake intersections
-        - Returns the intersection GeoDataFrame
+        - Finds river–lake pairs with a single STRtree query and the
+          length of each pair's intersection
+        - Returns the pair table (river + lake attributes and
+          'length_in_lake'); pairs sharing no length (e.g. a river end
+          point on a lake shore) are dropped, as gpd.overlay does
 
         Prints (optional / downstream use):
           - number of lakes intersecting any river segment
@@ -319,43 +305,51 @@ class ResolvableLakes:
         # --------------------------------------------------
         riv_valid = riv[
             riv.geometry.notna() & ~riv.geometry.is_empty
-        ].copy()
+        ]
 
         lake_valid = lake[
             lake.geometry.notna() & ~lake.geometry.is_empty
-        ].copy()
+        ]
 
         # --------------------------------------------------
         # 2. Short-circuit if nothing to intersect
         # --------------------------------------------------
         if riv_valid.empty or lake_valid.empty:
-            return gpd.GeoDataFrame(
-                columns=list(riv.columns) + list(lake.columns),
-                geometry=[],
-                crs=riv.crs
+            return pd.DataFrame(
+                columns=[c for c in list(riv.columns) + list(lake.columns) if c != "geometry"]
+                + ["length_in_lake"]
             )
 
         # --------------------------------------------------
-        # 3. Intersection
+        # 3. Intersection (only the lengths are kept, no geometry table)
         # --------------------------------------------------
-        river_lake_int = gpd.overlay(
-            riv_valid,
-            lake_valid,
-            how="intersection"
-        )
+        geom_riv = riv_valid.geometry.to_numpy()
+        geom_lake = lake_valid.geometry.to_numpy()
+        # Repair invalid lake polygons, as gpd.overlay does
+        invalid = ~shapely.is_valid(geom_lake)
+        if invalid.any():
+            geom_lake = geom_lake.copy()
+            geom_lake[invalid] = shapely.make_valid(geom_lake[invalid])
+        idx_riv, idx_lake = shapely.STRtree(geom_lake).query(geom_riv, predicate="intersects")
+        order = np.lexsort((idx_lake, idx_riv))
+        idx_riv, idx_lake = idx_riv[order], idx_lake[order]
+        length_in_lake = shapely.length(shapely.intersection(geom_riv[idx_riv], geom_lake[idx_lake]))
+        keep = length_in_lake > 0
+        idx_riv, idx_lake = idx_riv[keep], idx_lake[keep]
+        # River attributes, then lake attributes (suffixed on name clashes)
+        riv_attr = riv_valid.drop(columns=riv_valid.geometry.name).iloc[idx_riv].reset_index(drop=True)
+        lake_attr = lake_valid.drop(columns=lake_valid.geometry.name).iloc[idx_lake].reset_index(drop=True)
+        shared = riv_attr.columns.intersection(lake_attr.columns)
+        riv_attr = riv_attr.rename(columns={c: f"{c}_1" for c in shared})
+        lake_attr = lake_attr.rename(columns={c: f"{c}_2" for c in shared})
+        river_lake_int = pd.concat([riv_attr, lake_attr], axis=1)
+        river_lake_int["length_in_lake"] = length_in_lake[keep]
 
         # --------------------------------------------------
-        # 4. Summary metrics (if needed)
+        # 4. Summary metrics (if needed; not computed by default)
         # --------------------------------------------------
-        num_lakes = river_lake_int["LakeCOMID"].nunique()
-
-        multi_lake_riv = (
-            river_lake_int
-            .groupby("COMID")["LakeCOMID"]
-            .nunique()
-            .gt(1)
-            .sum()
-        )
+        # num_lakes = river_lake_int["LakeCOMID"].nunique()
+        # multi_lake_riv = river_lake_int.groupby("COMID")["LakeCOMID"].nunique().gt(1).sum()
 
         return river_lake_int
 
@@ -380,9 +374,9 @@ class ResolvableLakes:
             lake_filtered              -> lakes intersecting >1 river segment
             river_lake_int_filtered    -> cleaned rows matching lake_filtered
         """
-        df = river_lake_int.copy()
+        df = river_lake_int
         # Count unique river segments per lake
-        seg_count = df.groupby("LakeCOMID")["COMID"].nunique()
+        seg_count = df.drop_duplicates(["LakeCOMID", "COMID"])["LakeCOMID"].value_counts()
         # Lakes touching more than one river segment
         keep_ids = seg_count[seg_count > 1].index.tolist()
         # Filter both datasets
@@ -556,17 +550,19 @@ class ResolvableLakes:
         lake["exorheic"] = 0
         lake["endorheic"] = 0
         lakes_to_remove = []
-        # Build full river graph
-        original_graph = Utility.create_graph(
-            riv["COMID"].tolist(),
-            riv["NextDownCOMID"].tolist()
+        # Build full river adjacency (sparse; only connectivity is needed) and
+        # the connected-part label of every segment, once for all lakes
+        original_graph = Utility.create_adjacency(
+            riv["COMID"].to_numpy(),
+            riv["NextDownCOMID"].to_numpy()
         )
+        part_labels = Utility.network_part_labels(original_graph)
         # Add original river lengths (temporary)
         riv = riv.copy()
-        riv["_length_org"] = riv.geometry.length
+        riv["_length_org"] = shapely.length(riv.geometry.to_numpy())
         # Add intersection lengths (temporary)
         if "length_in_lake" not in df_int.columns:
-            df_int["_length_in_lake"] = df_int.geometry.length
+            df_int["_length_in_lake"] = shapely.length(df_int.geometry.to_numpy())
             length_col = "_length_in_lake"
         else:
             length_col = "length_in_lake"
@@ -574,8 +570,8 @@ class ResolvableLakes:
         # Process each lake
         # ----------------------------------------------------------
         for lake_id, group in df_int.groupby("LakeCOMID"):
-            comids = group["COMID"].tolist()
-            num_parts, components = Utility.count_network_parts(original_graph, comids)
+            labels = group["COMID"].map(part_labels)
+            num_parts = labels.nunique()
             # ======================================================
             # CASE 1 — Single connected river network
             # ======================================================
@@ -596,13 +592,8 @@ class ResolvableLakes:
             # ======================================================
             # CASE 2 — Multiple river networks enter the lake
             # ======================================================
-            keep = False
-            for comp in components:
-                sub = group[group["COMID"].isin(comp)]
-                # If ANY downstream segment has NextDownCOMID <= 0 → closed basin
-                if any(sub["NextDownCOMID"] <= 0):
-                    keep = True
-                    break
+            # If ANY downstream segment has NextDownCOMID <= 0 → closed basin
+            keep = bool((group.loc[labels.notna(), "NextDownCOMID"] <= 0).any())
             if keep:
                 lake.loc[lake["LakeCOMID"] == lake_id, "endorheic"] = 1
             else:
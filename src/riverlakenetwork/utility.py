@@ -1,18 +1,16 @@
 import geopandas as gpd
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import subprocess
 import os
-from   shapely.geometry import Point, LineString, MultiLineString
+import re
+import importlib.util
+from   shapely.geometry import LineString, MultiLineString
 from   scipy.spatial import cKDTree
-import yaml
-import shutil
+from   scipy.sparse import coo_matrix
+from   scipy.sparse.csgraph import connected_components
 import warnings
 import networkx as nx
-import re
-import copy
-from   collections import defaultdict, deque
+import shapely
 from typing import (
     Optional,
     Dict,
@@ -23,6 +21,9 @@ from typing import (
     List,
 )
 
+# Columns written by add_immediate_upstream (maxup, up1, up2, ...)
+_UPSTREAM_COL = re.compile(r'^(maxup|up\d+)$')
+
 class Utility:
 
     def compute_uparea(
@@ -55,13 +56,12 @@ class Utility:
         # --------------------------------------------------
         # 0. Copy + clean state
         # --------------------------------------------------
-        df = riv.copy()
         id_col = mapping["id"]
         next_col = mapping["next_id"]
         area_col = mapping["unitarea"]
-        # Always recompute uparea
-        if out_col in df.columns:
-            df = df.drop(columns=out_col)
+        # Always recompute uparea; drop already returns a new frame, so the
+        # input is copied exactly once either way
+        df = riv.drop(columns=out_col) if out_col in riv.columns else riv.copy()
         # --------------------------------------------------
         # 1. Enforce types
         # --------------------------------------------------
@@ -69,48 +69,41 @@ class Utility:
         df[next_col] = df[next_col].astype("Int64")  # preserves -9999
         df[area_col] = df[area_col].fillna(0.0).astype(float)
         # --------------------------------------------------
-        # 2. Prepare COMID set
-        # --------------------------------------------------
-        comids = set(df[id_col])
+        # 2. Dense 0..n-1 positions for the COMIDs
         # --------------------------------------------------
-        # 3. Internal clean downstream column
+        ids = df[id_col].to_numpy()
+        n = ids.size
+        order = np.argsort(ids, kind="stable")
+        ids_sorted = ids[order]
         # --------------------------------------------------
-        next_clean = df[next_col].replace(-9999, np.nan)
-        # Downstream IDs not present → terminal
-        next_clean.loc[~next_clean.isin(comids)] = np.nan
+        # 3. Internal clean downstream column (as positions)
         # --------------------------------------------------
-        # 4. Build topology
+        next_ids = df[next_col].to_numpy(dtype=float, na_value=np.nan)
+        pos = np.clip(np.searchsorted(ids_sorted, next_ids), 0, n - 1)
+        # -9999, missing, or downstream IDs not present → terminal (-1)
+        has_down = (next_ids != -9999) & (ids_sorted[pos] == next_ids)
+        down = np.where(has_down, order[pos], -1)
         # --------------------------------------------------
-        nextdown = dict(zip(df[id_col], next_clean))
-        uparea = dict(zip(df[id_col], df[area_col]))
+        # 4. Compute indegree
         # --------------------------------------------------
-        # 5. Compute indegree
+        uparea = df[area_col].to_numpy(dtype=float).copy()
+        indegree = np.bincount(down[has_down], minlength=n)
         # --------------------------------------------------
-        indegree = defaultdict(int)
-        for u, d in nextdown.items():
-            if pd.notna(d):
-                indegree[int(d)] += 1
+        # 5. Accumulate upstream area, one topological level at a time
+        #    (Kahn's algorithm with the queue processed as whole frontiers)
         # --------------------------------------------------
-        # 6. Initialize headwaters
+        frontier = np.flatnonzero(indegree == 0)
+        while frontier.size:
+            frontier = frontier[has_down[frontier]]
+            d = down[frontier]
+            np.add.at(uparea, d, uparea[frontier])
+            np.subtract.at(indegree, d, 1)
+            d = np.unique(d)
+            frontier = d[indegree[d] == 0]
         # --------------------------------------------------
-        queue = deque([cid for cid in comids if indegree.get(cid, 0) == 0])
-        # --------------------------------------------------
-        # 7. Accumulate upstream area
-        # --------------------------------------------------
-        while queue:
-            u = queue.popleft()
-            d = nextdown.get(u)
-            if pd.isna(d):
-                continue
-            d = int(d)
-            uparea[d] += uparea[u]
-            indegree[d] -= 1
-            if indegree[d] == 0:
-                queue.append(d)
+        # 6. Assign output
         # --------------------------------------------------
-        # 8. Assign output
-        # --------------------------------------------------
-        df[out_col] = df[id_col].map(uparea)
+        df[out_col] = uparea
         return df
 
     @staticmethod
@@ -126,8 +119,8 @@ class Utility:
         from upstream segments to their immediate downstream segment.
         The function performs the following steps:
         1. Removes any existing upstream-related columns (`maxup`, `up1`, `up2`, ...).
-        2. Builds a directed graph representation of the river network using
-           the downstream linkage information.
+        2. Groups the river segments by their downstream segment identifier
+           (one stable sort, no graph object or row iteration).
         3. Identifies immediate upstream segments for each river segment.
         4. Computes the number of immediate upstream segments (`maxup`).
         5. Expands upstream connectivity into separate columns (`up1`, `up2`, ...).
@@ -135,10 +128,13 @@ class Utility:
         -----
         - Downstream identifiers with negative values are treated as terminal
           (i.e., no downstream connection).
-        - Upstream segments are ordered arbitrarily based on graph traversal.
+        - Upstream segments keep the order in which they appear in `df`.
         - First-order rivers will have `maxup = 0` and no `up*` columns populated.
         - The function is side-effect free except for modifications to the
           returned DataFrame.
+        - The returned DataFrame records a hash of the ID/downstream columns in
+          ``attrs``; calling the function again on it (or a copy) with the
+          topology unchanged returns a copy without recomputing.
         Parameters
         ----------
         df : pandas.DataFrame
@@ -155,62 +151,137 @@ class Utility:
             - `maxup` : number of immediate upstream segments
             - `up1`, `up2`, ..., `upN` : IDs of immediate upstream segments
         """
-        df = df.drop(columns=df.filter(regex=r'^(maxup|up\d+)$').columns, errors="ignore")
         # get the name of ID and downID
         downID = mapping.get('next_id')
         ID = mapping.get('id')
-        # Create a directed graph
-        G = nx.DiGraph()
-        # Add edges from the DataFrame (reversing the direction)
-        for _, row in df.iterrows():
-            # print(row[ID], row[downID])
-            if row[downID] > -0.01:  # Skip nodes with negative downstream
-                G.add_edge(row[downID], row[ID])
-        # Find immediate upstream nodes for each node
-        immediate_upstream = {}
-        for node in G.nodes():
-            immediate_upstream[node] = list(G.successors(node))
-        # Create a new column containing lists of immediate upstream nodes
-        df['upstream'] = df[ID].apply(lambda x: immediate_upstream[x] if x in immediate_upstream else [])
-        # Find the maximum length of the lists in the 'upstream' column
-        df['maxup'] = 0
-        df['maxup'] = df['upstream'].apply(len)
-        # Create new columns 'maxup', 'up1', 'up2', 'up3', etc.
-        max_length = df['maxup'].max()
+        # Warm path: the up* columns were built by an earlier call on the same
+        # (row-ordered) topology, recorded as an order-sensitive hash in attrs
+        row_hash = pd.util.hash_pandas_object(df[[ID, downID]], index=False).to_numpy()
+        signature = (ID, downID, len(df),
+                     int((row_hash * np.arange(1, len(df) + 1, dtype=np.uint64)).sum()))
+        if df.attrs.get("immediate_upstream") == signature and "maxup" in df.columns:
+            max_length = int(df["maxup"].max()) if len(df) else 0
+            if max_length > 0 and all(f'up{i + 1}' in df.columns for i in range(max_length)):
+                return df.copy()
+        df = df.drop(columns=[c for c in df.columns if _UPSTREAM_COL.match(str(c))])
+        ids = df[ID].to_numpy()
+        down = df[downID].to_numpy()
+        # Keep links with a downstream segment (negative/NaN are terminal)
+        with np.errstate(invalid="ignore"):
+            linked = down > -0.01
+        up_ids = ids[linked]
+        up_down = down[linked]
+        # Bucket upstream IDs by their downstream segment; the stable sort
+        # keeps the upstream segments of each bucket in row order
+        order = np.argsort(up_down, kind="stable")
+        up_ids = up_ids[order]
+        keys, starts, counts = np.unique(up_down[order], return_index=True, return_counts=True)
+        # Locate each segment's bucket (if any)
+        pos = np.searchsorted(keys, ids)
+        pos[pos == len(keys)] = 0
+        found = (keys[pos] == ids) if len(keys) else np.zeros(len(ids), dtype=bool)
+        n_up = np.zeros(len(ids), dtype=np.int64)
+        n_up[found] = counts[pos[found]]
+        df['maxup'] = n_up
+        # Create new columns 'up1', 'up2', 'up3', etc.
+        max_length = int(n_up.max()) if len(n_up) else 0
         if max_length > 0:
-            for i in range(max_length):
-                df[f'up{i + 1}'] = df['upstream'].apply(lambda x: x[i] if i < len(x) else 0)
+            # Fill one (N, max_length) matrix: row r takes its bucket's upstream
+            # IDs in slots 0..n_up[r]-1, the remaining slots stay 0
+            rows = np.repeat(np.arange(len(ids)), n_up)
+            slot = np.arange(len(rows)) - np.repeat(np.cumsum(n_up) - n_up, n_up)
+            up = np.zeros((len(ids), max_length), dtype=up_ids.dtype)
+            up[rows, slot] = up_ids[starts[pos[rows]] + slot]
+            df[[f'up{i + 1}' for i in range(max_length)]] = up
         else:
             print('It seems there is no upstream segment for the provided river network. '+\
                   'This may mean the river network you are working may have first order rivers '+\
                   'that are not connected.')
-        # drop upstream
-        df = df.drop(columns = 'upstream')
+        df.attrs["immediate_upstream"] = signature
         return df
 
 
     def create_graph(segment_ids, next_down_ids):
         """Create a directed graph from river network data."""
+        # Object arrays keep the caller's ID values (and types) as node labels
+        seg = np.asarray(segment_ids, dtype=object)
+        down = np.asarray(next_down_ids, dtype=object)
+        # Links with a valid (non-missing, non-negative) downstream segment
+        down_num = pd.to_numeric(pd.Series(down), errors="coerce").to_numpy()
+        with np.errstate(invalid="ignore"):
+            linked = down_num >= 0
         G = nx.DiGraph()
-        for seg, down in zip(segment_ids, next_down_ids):
-            if pd.isna(down) or down is None or down < 0:
-                G.add_node(seg)
-            else:
-                G.add_edge(seg, down)
+        G.add_nodes_from(seg.tolist())
+        G.add_edges_from(zip(seg[linked].tolist(), down[linked].tolist()))
         return G
 
+    def create_adjacency(segment_ids, next_down_ids):
+        """
+        Create the sparse (CSR) adjacency of a river network, without NetworkX.
+
+        Nodes and edges match `create_graph`; returns ``(adjacency, nodes)``
+        where row/column i is ``nodes[i]``. Use ``nx.from_scipy_sparse_array``
+        to turn it into a graph when one is needed.
+        """
+        seg = np.asarray(segment_ids)
+        down = pd.to_numeric(pd.Series(next_down_ids), errors="coerce").to_numpy(dtype=float)
+        # Links with a valid (non-missing, non-negative) downstream segment
+        with np.errstate(invalid="ignore"):
+            linked = down >= 0
+        down = down[linked]
+        if seg.dtype.kind in "iu":
+            down = down.astype(seg.dtype)
+        # Downstream IDs outside segment_ids become extra nodes, as in create_graph
+        codes, nodes = pd.factorize(np.concatenate([seg, down]))
+        src = codes[:len(seg)][linked]
+        dst = codes[len(seg):]
+        adjacency = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)),
+                               shape=(len(nodes), len(nodes))).tocsr()
+        return adjacency, nodes.tolist()
+
+    def _network_part_labels(graph):
+        """Weakly connected component label of every node (sparse C union pass)."""
+        if isinstance(graph, tuple):
+            adjacency, nodes = graph
+        else:
+            nodes = list(graph.nodes)
+            pos = {node: i for i, node in enumerate(nodes)}
+            edges = np.array([(pos[u], pos[v]) for u, v in graph.edges], dtype=np.int64).reshape(-1, 2)
+            adjacency = coo_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])),
+                                   shape=(len(nodes), len(nodes))).tocsr()
+        n_components, labels = connected_components(adjacency, directed=True, connection="weak")
+        return nodes, n_components, labels
+
+    def network_part_labels(graph):
+        """
+        Map each node of a river network to the label of its connected part.
+        `graph` is a graph from `create_graph` or the ``(adjacency, nodes)``
+        pair from `create_adjacency`.
+        """
+        nodes = graph[1] if isinstance(graph, tuple) else graph.nodes
+        if len(nodes) == 0:
+            return {}
+        nodes, _, labels = Utility._network_part_labels(graph)
+        return dict(zip(nodes, labels.tolist()))
+
     def count_network_parts(graph, COMID_sample=None):
         """Count the number of connected parts in a river network graph."""
-        # Get all weakly connected components
-        connected_components = list(nx.weakly_connected_components(graph))
+        if len(graph[1] if isinstance(graph, tuple) else graph.nodes) == 0:
+            return 0, []
+        nodes, n_components, labels = Utility._network_part_labels(graph)
+        pos = {node: i for i, node in enumerate(nodes)}
         if COMID_sample is None:
-            return len(connected_components), connected_components
-        # Find which component each sampled node belongs to
-        sample_components = set()
-        for component in connected_components:
-            if any(node in component for node in COMID_sample):
-                sample_components.add(frozenset(component))  # Use frozenset to store unique components
-        return len(sample_components), [set(comp) for comp in sample_components]
+            wanted = np.arange(n_components)
+        else:
+            # Components holding at least one sampled node
+            wanted = np.unique([labels[pos[node]] for node in COMID_sample if node in pos]).astype(np.int64)
+        # Split the nodes by component label
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(n_components + 1))
+        nodes_arr = np.empty(len(nodes), dtype=object)
+        nodes_arr[:] = nodes
+        components = [set(nodes_arr[order[bounds[k]:bounds[k + 1]]].tolist()) for k in wanted]
+        return len(components), components
 
     @staticmethod
     def compute_next_downstream(
@@ -484,13 +555,11 @@ class Utility:
         GeoDataFrame
             Updated lake shapefile.
         """
-        import geopandas as gpd
-
-        # ---------------------------
-        # Remove lakes if specified
-        # ---------------------------
-        if lake_to_remove:
-            lake_shp = lake_shp[~lake_shp["Hylak_id"].isin(lake_to_remove)].reset_index(drop=True)
+        # Lakes to drop (requested + merged-away); the full table is
+        # filtered only once at the end
+        drop_ids = set(lake_to_remove or [])
+        # Hylak_id of merged target -> merged attribute values
+        merged_rows = {}
 
         # ---------------------------
         # Merge lakes if specified
@@ -498,35 +567,57 @@ class Utility:
         if merge_lakes:
             for new_name, ids_to_merge in merge_lakes.items():
                 # Select lakes to merge
-                shp_slice = lake_shp[lake_shp["Hylak_id"].isin(ids_to_merge)].copy()
+                shp_slice = lake_shp[
+                    lake_shp["Hylak_id"].isin(ids_to_merge)
+                    & ~lake_shp["Hylak_id"].isin(drop_ids)
+                ].copy()
                 if shp_slice.empty:
                     continue
 
-                # Fix potential geometry issues with small buffer
-                shp_slice.geometry = shp_slice.geometry.buffer(0.00001)
-
-                # Dissolve into one geometry
-                shp_dissolve = shp_slice.dissolve().reset_index(drop=True)
-
-                # Update the first lake in the list with merged values
-                target_idx = lake_shp[lake_shp["Hylak_id"] == ids_to_merge[-1]].index
-                lake_shp.loc[target_idx, "geometry"] = shp_dissolve.geometry.iloc[0]
-                lake_shp.loc[target_idx, "Lake_name"] = new_name
-                lake_shp.loc[target_idx, "Lake_area"] = shp_slice["Lake_area"].sum()
-                lake_shp.loc[target_idx, "Vol_total"] = shp_slice["Vol_total"].sum()
-                lake_shp.loc[target_idx, "Shore_len"] = shp_slice["Shore_len"].sum()
-                lake_shp.loc[target_idx, "Depth_avg"] = shp_slice["Depth_avg"].mean()
-                lake_shp.loc[target_idx, "Dis_avg"] = shp_slice["Dis_avg"].mean()
-                lake_shp.loc[target_idx, "Res_time"] = shp_slice["Res_time"].mean()
-                lake_shp.loc[target_idx, "Country"] = shp_slice["Country"].iloc[0]  # take first value
-                lake_shp.loc[target_idx, "Continent"] = shp_slice["Continent"].iloc[0]
-                lake_shp.loc[target_idx, "Poly_src"] = shp_slice["Poly_src"].iloc[0]
-                lake_shp.loc[target_idx, "Lake_type"] = 1
-                lake_shp.loc[target_idx, "Grand_id"] = 0
+                # Lakes merged by an earlier entry carry their merged values
+                for hylak_id, values in merged_rows.items():
+                    rows = shp_slice["Hylak_id"] == hylak_id
+                    if rows.any():
+                        shp_slice.loc[rows, list(values)] = list(values.values())
+
+                # Repair geometry and union directly in GEOS (no dissolve/groupby);
+                # fall back to a small buffer when the lakes only nearly touch
+                geoms = shapely.make_valid(shp_slice.geometry.values)
+                merged_geom = shapely.union_all(geoms)
+                if shapely.get_type_id(merged_geom) != 3:  # not a single Polygon
+                    merged_geom = shapely.union_all(
+                        shapely.buffer(geoms, 0.00001, quad_segs=16))
+
+                # Update the last lake in the list with merged values
+                target_id = ids_to_merge[-1]
+                if (shp_slice["Hylak_id"] == target_id).any():
+                    merged_rows[target_id] = {
+                        "geometry": merged_geom,
+                        "Lake_name": new_name,
+                        "Lake_area": shp_slice["Lake_area"].sum(),
+                        "Vol_total": shp_slice["Vol_total"].sum(),
+                        "Shore_len": shp_slice["Shore_len"].sum(),
+                        "Depth_avg": shp_slice["Depth_avg"].mean(),
+                        "Dis_avg": shp_slice["Dis_avg"].mean(),
+                        "Res_time": shp_slice["Res_time"].mean(),
+                        "Country": shp_slice["Country"].iloc[0],  # take first value
+                        "Continent": shp_slice["Continent"].iloc[0],
+                        "Poly_src": shp_slice["Poly_src"].iloc[0],
+                        "Lake_type": 1,
+                        "Grand_id": 0,
+                    }
 
                 # Drop all other merged lakes except the last one
-                drop_ids = [i for i in ids_to_merge if i != ids_to_merge[-1]]
-                lake_shp = lake_shp[~lake_shp["Hylak_id"].isin(drop_ids)].reset_index(drop=True)
+                drop_ids.update(i for i in ids_to_merge if i != target_id)
+
+        # ---------------------------
+        # Remove lakes in a single pass and write merged rows (single row write)
+        # ---------------------------
+        if drop_ids or merged_rows:
+            lake_shp = lake_shp[~lake_shp["Hylak_id"].isin(drop_ids)].reset_index(drop=True)
+        for hylak_id, values in merged_rows.items():
+            target_idx = np.flatnonzero(lake_shp["Hylak_id"].to_numpy() == hylak_id)
+            lake_shp.loc[target_idx, list(values)] = list(values.values())
 
         return lake_shp
 
@@ -596,14 +687,13 @@ class Utility:
         # --------------------------------------------------
         # 1. Prepare clean topology
         # --------------------------------------------------
-        df = riv[[id_col, next_col]].copy()
-        df[id_col] = df[id_col].astype(int)
-        df[next_col] = df[next_col].astype("Int64")
-        comids = set(df[id_col])
-        # Clean downstream (internal only)
-        next_clean = df[next_col].replace(-9999, np.nan)
-        next_clean.loc[~next_clean.isin(comids)] = np.nan
-        next_map = dict(zip(df[id_col], next_clean))
+        ids = riv[id_col].astype(int).to_numpy()
+        nxt = riv[next_col].astype("Int64").to_numpy(dtype=np.float64, na_value=np.nan)
+        # Clean downstream (internal only): -9999, missing or unknown IDs → None
+        valid = (nxt != -9999) & np.isin(nxt, ids)
+        next_clean = np.full(len(ids), None, dtype=object)
+        next_clean[valid] = nxt[valid].astype(np.int64).tolist()
+        next_map = dict(zip(ids.tolist(), next_clean.tolist()))
         # --------------------------------------------------
         # 2. Loop detection
         # --------------------------------------------------
@@ -743,60 +833,50 @@ class Utility:
                     if min_cst_id < max_cat_id:
                         sys.exit('there is some mixed up COMID between the cat and costal hillslope')
             if not cst_col_area in cst.columns: # then we need to populate the id
-                cst[cst_col_area] = cst.to_crs(epsg=6933).area / 1e6
+                # reproject the geometry column only (equal-area), not the whole frame
+                cst[cst_col_area] = cst.geometry.to_crs(epsg=6933).area.to_numpy() / 1e6
             # drop FID column
             cst = cst.drop(columns = ['FID'])
             # return
             return cst
 
         def add_cat_only_comids_to_riv(riv: pd.DataFrame, cat: pd.DataFrame):
-            riv = riv.copy()
-            cat = cat.copy()
-
-            # Ensure consistent COMID type
-            riv["COMID"] = riv["COMID"].astype(int)
-            cat["COMID"] = cat["COMID"].astype(int)
+            # Ensure consistent COMID type (assign copies riv once)
+            riv = riv.assign(COMID=riv["COMID"].astype(int))
+            cat_comid = cat["COMID"].astype(int)
 
             # -----------------------------
-            # 1. Identify CAT-only COMIDs
+            # 1. Identify CAT-only COMIDs (sorted, unique)
             # -----------------------------
-            missing_comids = sorted(set(cat["COMID"]) - set(riv["COMID"]))
-            if not missing_comids:
+            missing_comids = np.setdiff1d(cat_comid.to_numpy(), riv["COMID"].to_numpy())
+            if missing_comids.size == 0:
                 return riv
 
             # -----------------------------
-            # 2. Create empty riv rows
-            # -----------------------------
-            new_rows = pd.DataFrame(index=range(len(missing_comids)), columns=riv.columns)
-            new_rows["COMID"] = missing_comids
-
-            # -----------------------------
-            # 3. Transfer unitarea → uparea
-            # -----------------------------
-            unitarea_map = cat.set_index("COMID")["unitarea"].astype(float)
-            new_rows["uparea"] = new_rows["COMID"].map(unitarea_map)
-
+            # 2. Create riv rows for the filled columns only;
+            #    concat brings in the other columns as missing
             # -----------------------------
-            # 4. Set topology defaults
-            # -----------------------------
-            new_rows["NextDownID"] = 0
-            new_rows["lengthkm"] = 0
-            new_rows["maxup"] = 0
-
+            # Transfer unitarea → uparea
+            unitarea_map = pd.Series(cat["unitarea"].astype(float).to_numpy(), index=cat_comid)
             # up* columns EXCEPT uparea
             up_cols = [
                 c for c in riv.columns
                 if c.lower().startswith("up") and c.lower() != "uparea"
             ]
-            new_rows[up_cols] = 0
+            new_rows = pd.DataFrame({
+                "COMID": missing_comids,
+                "uparea": pd.Series(missing_comids).map(unitarea_map).to_numpy(),
+                # topology defaults
+                "NextDownID": 0,
+                "lengthkm": 0,
+                "maxup": 0,
+                **{c: 0 for c in up_cols},
+            })
 
             # -----------------------------
-            # 5. Append and sort
+            # 3. Append (the caller sorts once afterwards)
             # -----------------------------
-            riv = pd.concat([riv, new_rows], ignore_index=True)
-            riv = riv.sort_values("COMID").reset_index(drop=True)
-
-            return riv
+            return pd.concat([riv, new_rows], ignore_index=True)
 
         def fix_DownID(riv: pd.DataFrame) -> pd.DataFrame:
             riv = riv.copy()
@@ -806,27 +886,33 @@ class Utility:
                 riv["NextDownID"], errors="coerce"
             ).astype("Int64")
 
-            valid_comids = set(riv["COMID"])
+            # Downstream IDs outside the network get category code -1 (one hashed pass)
+            unknown = pd.Categorical(riv["NextDownID"], categories=riv["COMID"].unique()).codes < 0
 
             invalid = (
                 riv["NextDownID"].notna()
                 & (
                     (riv["NextDownID"] <= 0)
-                    | ~riv["NextDownID"].isin(valid_comids)
+                    | unknown
                 )
             )
 
             riv.loc[invalid, "NextDownID"] = -9999
             return riv
 
+        def read_layer(path: str) -> gpd.GeoDataFrame:
+            # bulk (pyogrio) reader; Arrow transfer when pyarrow is installed
+            return gpd.read_file(path, engine="pyogrio",
+                                 use_arrow=importlib.util.find_spec("pyarrow") is not None)
+
         # read files cat, riv, cst
-        riv = gpd.read_file(os.path.join(riv_file))
-        cat = gpd.read_file(os.path.join(cat_file))
+        riv = read_layer(os.path.join(riv_file))
+        cat = read_layer(os.path.join(cat_file))
         # check the length of riv and cat
         if len(riv) != len(cat):
             raise error
         if not cst_file is None:
-            cst = gpd.read_file(os.path.join(cst_file))
+            cst = read_layer(os.path.join(cst_file))
             # add cat and cst
             cst = merit_cst_prepare(cst,
                                     {'id':'COMID','area':'unitarea'},
@@ -843,16 +929,14 @@ class Utility:
         cat.set_crs(epsg=4326, inplace=True, allow_override=True)
         cat.reset_index(drop=True, inplace=True)
         # sort COMID
-        riv.sort_values(by='COMID', axis='index', inplace=True)
-        riv.reset_index(drop=True, inplace=True)
-        # sort COMID
         cat.sort_values(by='COMID', axis='index', inplace=True)
         cat.reset_index(drop=True, inplace=True)
         # set the projection
         riv.set_crs(epsg=4326, inplace=True, allow_override=True)
         cat.set_crs(epsg=4326, inplace=True, allow_override=True)
-        # fix the network topology
+        # fix the network topology, then sort COMID once (single row shuffle)
         riv = add_cat_only_comids_to_riv(riv,cat)
+        riv = riv.iloc[np.argsort(riv["COMID"].to_numpy(), kind="stable")].reset_index(drop=True)
         # fix network topology
         riv = fix_DownID(riv)
         # add the non_channelized
@@ -875,12 +959,13 @@ class Utility:
             riv["Tosegment"] = pd.to_numeric(
                 riv["Tosegment"], errors="coerce"
             ).astype("Int64")
-            valid_comids = set(riv["seg_id"])
+            # Downstream IDs outside the network get category code -1 (one hashed pass)
+            unknown = pd.Categorical(riv["Tosegment"], categories=riv["seg_id"].unique()).codes < 0
             invalid = (
                 riv["Tosegment"].notna()
                 & (
                     (riv["Tosegment"] <= 0)
-                    | ~riv["Tosegment"].isin(valid_comids)
+                    | unknown
                 )
             )
             riv.loc[invalid, "Tosegment"] = -9999
@@ -944,55 +1029,50 @@ class Utility:
             riv["NextDownCOMID"] = pd.to_numeric(
                 riv["NextDownCOMID"], errors="coerce"
             ).astype("Int64")
-            valid_comids = set(riv["COMID"])
+            # Downstream IDs outside the network get category code -1 (one hashed pass)
+            unknown = pd.Categorical(riv["NextDownCOMID"], categories=riv["COMID"].unique()).codes < 0
             invalid = (
                 riv["NextDownCOMID"].notna()
                 & (
                     (riv["NextDownCOMID"] <= 0)
-                    | ~riv["NextDownCOMID"].isin(valid_comids)
+                    | unknown
                 )
             )
             riv.loc[invalid, "NextDownCOMID"] = -9999
             return riv
         def add_cat_only_comids_to_riv(riv: pd.DataFrame, cat: pd.DataFrame):
-            riv = riv.copy()
-            cat = cat.copy()
-            # Ensure consistent COMID type
-            riv["COMID"] = riv["COMID"].astype(int)
-            cat["COMID"] = cat["COMID"].astype(int)
+            # Ensure consistent COMID type (assign copies riv once)
+            riv = riv.assign(COMID=riv["COMID"].astype(int))
+            cat_comid = cat["COMID"].astype(int)
             # -----------------------------
-            # 1. Identify CAT-only COMIDs
+            # 1. Identify CAT-only COMIDs (sorted, unique)
             # -----------------------------
-            missing_comids = sorted(set(cat["COMID"]) - set(riv["COMID"]))
-            if not missing_comids:
+            missing_comids = np.setdiff1d(cat_comid.to_numpy(), riv["COMID"].to_numpy())
+            if missing_comids.size == 0:
                 return riv
             # -----------------------------
-            # 2. Create empty riv rows
-            # -----------------------------
-            new_rows = pd.DataFrame(index=range(len(missing_comids)), columns=riv.columns)
-            new_rows["COMID"] = missing_comids
+            # 2. Create riv rows for the filled columns only;
+            #    concat brings in the other columns as missing
             # -----------------------------
-            # 3. Transfer unitarea → uparea
-            # -----------------------------
-            unitarea_map = cat.set_index("COMID")["unitarea"].astype(float)
-            new_rows["uparea"] = new_rows["COMID"].map(unitarea_map)
-            # -----------------------------
-            # 4. Set topology defaults
-            # -----------------------------
-            new_rows["NextDownCOMID"] = 0
-            new_rows["length"] = 0
+            # Transfer unitarea → uparea
+            unitarea_map = pd.Series(cat["unitarea"].astype(float).to_numpy(), index=cat_comid)
             # up* columns EXCEPT uparea
             up_cols = [
                 c for c in riv.columns
                 if c.lower().startswith("up") and c.lower() != "uparea"
             ]
-            new_rows[up_cols] = 0
+            new_rows = pd.DataFrame({
+                "COMID": missing_comids,
+                "uparea": pd.Series(missing_comids).map(unitarea_map).to_numpy(),
+                # topology defaults
+                "NextDownCOMID": 0,
+                "length": 0,
+                **{c: 0 for c in up_cols},
+            })
             # -----------------------------
-            # 5. Append and sort
+            # 3. Append (the caller sorts once afterwards)
             # -----------------------------
-            riv = pd.concat([riv, new_rows], ignore_index=True)
-            riv = riv.sort_values("COMID").reset_index(drop=True)
-            return riv
+            return pd.concat([riv, new_rows], ignore_index=True)
         # read files cat, riv, cst
         riv = gpd.read_file(os.path.join(riv_file))
         cat = gpd.read_file(os.path.join(cat_file))
@@ -1030,17 +1110,15 @@ class Utility:
         # ------------------------------------------------------------------
         # riv and cat are now synchronized
         # ------------------------------------------------------------------
-        # sort seg_id
-        riv.sort_values(by='COMID', axis='index', inplace=True)
-        riv.reset_index(drop=True, inplace=True)
         # sort hruid
         cat.sort_values(by='COMID', axis='index', inplace=True)
         cat.reset_index(drop=True, inplace=True)
         # set the projection
         riv.set_crs(epsg=4326, inplace=True, allow_override=True)
         cat.set_crs(epsg=4326, inplace=True, allow_override=True)
-        # fix the network topology
+        # fix the network topology, then sort COMID once (single row shuffle)
         riv = add_cat_only_comids_to_riv(riv,cat)
+        riv = riv.iloc[np.argsort(riv["COMID"].to_numpy(), kind="stable")].reset_index(drop=True)
         # fix network topology
         riv = fix_DownID(riv)
         # add the non_channelized